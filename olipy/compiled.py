@@ -0,0 +1,416 @@
+"""A compact binary representation of corpora made of word lists.
+
+Parsing a big word list like english_words.json creates tens of
+thousands of Python string objects, in every process that loads
+it. A compiled corpus file stores each large list of strings as a
+single UTF-8 blob plus an array of offsets. The file is memory-mapped,
+and the list shows up as a read-only StringTable, so processes share
+the data through the operating system's page cache, and a string is
+only created when someone asks for it.
+
+Everything else in the corpus (descriptions, small lists, numbers) is
+stored as JSON in the file header.
+
+A CorpusStore goes further, packing any number of corpora of any
+shape into one memory-mapped file. Every list and dictionary in the
+store shows up as a read-only view (FrozenList or FrozenDict) which
+reads from the shared memory as needed, so a fleet of worker
+processes can all use the same corpora without each of them keeping
+its own copy.
+"""
+from array import array
+from collections.abc import Mapping, Sequence
+import json
+import mmap
+import os
+import struct
+import sys
+
+MAGIC = b"OLIPYSTR"
+VERSION = 1
+
+# Magic number, version, header length.
+PREAMBLE = struct.Struct("<8sII")
+
+# In the header, each compiled list is replaced by a dictionary with
+# this as its only key, and the index of the table as the value.
+TABLE_MARKER = "\x00table"
+
+# Lists of strings shorter than this are left in the header.
+MINIMUM_TABLE_SIZE = 64
+
+class StringTable(Sequence):
+    """A read-only list of strings, backed by a buffer.
+
+    :param buffer: A bytes-like object, typically an mmap.
+    :param offset: Where in `buffer` the table starts.
+    :param length: How many strings are in the table.
+    """
+
+    def __init__(self, buffer, offset, length):
+        view = memoryview(buffer)
+        offsets_end = offset + (length + 1) * 4
+        self.offsets = view[offset:offsets_end].cast("I")
+        self.blob = view[offsets_end:offsets_end + self.offsets[-1]]
+        self.length = length
+
+    @classmethod
+    def encode(cls, strings):
+        """Turn a list of strings into the bytes of a StringTable."""
+        offsets = array("I", [0])
+        encoded = []
+        end = 0
+        for s in strings:
+            s = s.encode("utf8")
+            encoded.append(s)
+            end += len(s)
+            offsets.append(end)
+        return offsets.tobytes() + b"".join(encoded)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError("StringTable index out of range")
+        return str(self.blob[self.offsets[index]:self.offsets[index+1]], "utf8")
+
+    def __iter__(self):
+        blob = self.blob
+        offsets = self.offsets
+        for i in range(self.length):
+            yield str(blob[offsets[i]:offsets[i+1]], "utf8")
+
+    def __repr__(self):
+        return "<StringTable of %d strings>" % self.length
+
+def _is_string_list(value):
+    return (
+        isinstance(value, list) and len(value) >= MINIMUM_TABLE_SIZE
+        and set(map(type, value)) == {str}
+    )
+
+def _extract_tables(value, tables):
+    """Replace every large list of strings in `value` with a marker,
+    collecting the lists in `tables`.
+    """
+    if _is_string_list(value):
+        tables.append(value)
+        return {TABLE_MARKER: len(tables) - 1}
+    if isinstance(value, dict):
+        return dict((k, _extract_tables(v, tables)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_extract_tables(v, tables) for v in value]
+    return value
+
+def _insert_tables(value, tables):
+    """Undo _extract_tables, substituting StringTables for the markers."""
+    if isinstance(value, dict):
+        if len(value) == 1 and TABLE_MARKER in value:
+            return tables[value[TABLE_MARKER]]
+        return dict((k, _insert_tables(v, tables)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_insert_tables(v, tables) for v in value]
+    return value
+
+def _pad(data, fill=b"\x00"):
+    """Pad the given bytes so the following array is aligned."""
+    return data + fill * (-len(data) % 4)
+
+def write(path, data, source=None):
+    """Write a parsed corpus to `path` in compiled form.
+
+    :param source: The path to the JSON file the data came from. Its
+        size and modification time are recorded, so that a stale
+        compiled file can be detected.
+    """
+    tables = []
+    skeleton = _extract_tables(data, tables)
+    encoded = [_pad(StringTable.encode(table)) for table in tables]
+    header = dict(
+        byteorder=sys.byteorder, data=skeleton, tables=[],
+        source=source and _fingerprint(source),
+    )
+    # The header records where each table starts, which depends on
+    # the length of the header. Encode it with a placeholder for each
+    # offset, then fill in the real ones, which may be longer.
+    offsets = [0] * len(tables)
+    while True:
+        header["tables"] = [
+            [offset, len(table)] for offset, table in zip(offsets, tables)
+        ]
+        header_bytes = _pad(json.dumps(header).encode("utf8"), b" ")
+        position = PREAMBLE.size + len(header_bytes)
+        new_offsets = []
+        for table in encoded:
+            new_offsets.append(position)
+            position += len(table)
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+
+    with open(path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for table in encoded:
+            f.write(table)
+
+def read_header(buffer):
+    magic, version, header_length = PREAMBLE.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a compiled corpus file (version %d)" % VERSION)
+    start = PREAMBLE.size
+    return json.loads(bytes(buffer[start:start+header_length]))
+
+def load(path, source=None):
+    """Memory-map a compiled corpus file.
+
+    :param source: If given, the path to the original JSON file. None
+        is returned if the compiled file was made from a different
+        version of that file.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header = read_header(buffer)
+    if header["byteorder"] != sys.byteorder:
+        return None
+    if source and header["source"] != _fingerprint(source):
+        return None
+    tables = [
+        StringTable(buffer, offset, length)
+        for offset, length in header["tables"]
+    ]
+    return _insert_tables(header["data"], tables)
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# The store format. Every value in a corpus is written as a node,
+# starting on a four-byte boundary, with a one-byte tag:
+#
+# n, t, f: null, true, false
+# i, d: 64-bit integer, 64-bit float
+# s: string. A 32-bit length, then UTF-8 data.
+# S: list of strings. A 32-bit count, then a StringTable.
+# l: list. A 32-bit count, then the offset of each item.
+# o: object. A 32-bit count, then the offsets of each key and value.
+# j: anything else, as a JSON string. (Used for huge integers.)
+#
+# After the nodes comes a JSON header giving the offset of each
+# corpus in the store.
+STORE_MAGIC = b"OLIPYSTO"
+STORE_VERSION = 1
+
+# Magic number, version, header offset, header length.
+STORE_PREAMBLE = struct.Struct("<8sIQI")
+
+NODE = struct.Struct("=cxxxI")
+INT = struct.Struct("=q")
+FLOAT = struct.Struct("=d")
+
+class FrozenList(Sequence):
+    """A read-only list stored in a CorpusStore."""
+
+    def __init__(self, view, offset):
+        self.view = view
+        self.length = NODE.unpack_from(view, offset)[1]
+        start = offset + NODE.size
+        self.offsets = view[start:start + self.length * 4].cast("I")
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.length))]
+        return _node(self.view, self.offsets[index])
+
+    def __iter__(self):
+        view = self.view
+        for offset in self.offsets:
+            yield _node(view, offset)
+
+    def __repr__(self):
+        return "<FrozenList of %d items>" % self.length
+
+class FrozenDict(Mapping):
+    """A read-only dictionary stored in a CorpusStore."""
+
+    def __init__(self, view, offset):
+        self.view = view
+        self.length = NODE.unpack_from(view, offset)[1]
+        start = offset + NODE.size
+        self.offsets = view[start:start + self.length * 8].cast("I")
+        self._index = None
+
+    @property
+    def index(self):
+        """Map each key to the offset of its value."""
+        if self._index is None:
+            offsets = self.offsets
+            self._index = dict(
+                (_node(self.view, offsets[i]), offsets[i+1])
+                for i in range(0, len(offsets), 2)
+            )
+        return self._index
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        return _node(self.view, self.index[key])
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def __repr__(self):
+        return "<FrozenDict of %d items>" % self.length
+
+def _node(view, offset):
+    """Turn the node at `offset` into a Python object or a view."""
+    tag, value = NODE.unpack_from(view, offset)
+    start = offset + NODE.size
+    if tag == b"s":
+        return str(view[start:start + value], "utf8")
+    if tag == b"S":
+        return StringTable(view, start, value)
+    if tag == b"o":
+        return FrozenDict(view, offset)
+    if tag == b"l":
+        return FrozenList(view, offset)
+    if tag == b"i":
+        return INT.unpack_from(view, start)[0]
+    if tag == b"d":
+        return FLOAT.unpack_from(view, start)[0]
+    if tag == b"n":
+        return None
+    if tag == b"t":
+        return True
+    if tag == b"f":
+        return False
+    if tag == b"j":
+        return json.loads(str(view[start:start + value], "utf8"))
+    raise ValueError("Unknown node type %r at offset %d" % (tag, offset))
+
+class _StoreWriter(object):
+
+    def __init__(self, f):
+        self.f = f
+        self.position = f.tell()
+
+    def write(self, data):
+        self.f.write(data)
+        self.position += len(data)
+
+    def node(self, tag, value, payload=b""):
+        """Write a node and return its offset."""
+        self.write(b"\x00" * (-self.position % 4))
+        offset = self.position
+        self.write(NODE.pack(tag, value))
+        self.write(payload)
+        return offset
+
+    def value(self, value):
+        if value is None:
+            return self.node(b"n", 0)
+        if value is True:
+            return self.node(b"t", 0)
+        if value is False:
+            return self.node(b"f", 0)
+        if isinstance(value, int):
+            if -2**63 <= value < 2**63:
+                return self.node(b"i", 0, INT.pack(value))
+            encoded = json.dumps(value).encode("utf8")
+            return self.node(b"j", len(encoded), encoded)
+        if isinstance(value, float):
+            return self.node(b"d", 0, FLOAT.pack(value))
+        if isinstance(value, str):
+            encoded = value.encode("utf8")
+            return self.node(b"s", len(encoded), encoded)
+        if isinstance(value, Mapping):
+            offsets = array("I")
+            for k, v in value.items():
+                offsets.append(self.value(k))
+                offsets.append(self.value(v))
+            return self.node(b"o", len(value), offsets.tobytes())
+        if isinstance(value, (list, tuple, Sequence)):
+            if value and set(map(type, value)) == {str}:
+                return self.node(b"S", len(value), StringTable.encode(value))
+            offsets = array("I", [self.value(v) for v in value])
+            return self.node(b"l", len(value), offsets.tobytes())
+        raise TypeError("Can't store %r" % value)
+
+class CorpusStore(object):
+    """Many corpora packed into one memory-mapped file.
+
+    :param path: The path to a file created by CorpusStore.write().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        magic, version, header_offset, header_length = (
+            STORE_PREAMBLE.unpack_from(self.view)
+        )
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError("Not a corpus store (version %d)" % STORE_VERSION)
+        header = json.loads(
+            bytes(self.view[header_offset:header_offset + header_length])
+        )
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError("Corpus store was built on a different platform")
+        self.entries = header["entries"]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def keys(self):
+        return self.entries.keys()
+
+    def get(self, key, source=None):
+        """Find a corpus in the store.
+
+        :param source: If given, the path to the corpus's JSON file.
+            None is returned if the store was made from a different
+            version of that file.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        offset, fingerprint = entry
+        if source and fingerprint != _fingerprint(source):
+            return None
+        return _node(self.view, offset)
+
+    @classmethod
+    def write(cls, path, corpora):
+        """Write a store file.
+
+        :param corpora: A list of (key, data, source) 3-tuples, where
+            `source` is the path to the corpus's JSON file, or None.
+        """
+        entries = dict()
+        with open(path, "wb") as f:
+            f.write(STORE_PREAMBLE.pack(STORE_MAGIC, STORE_VERSION, 0, 0))
+            writer = _StoreWriter(f)
+            for key, data, source in corpora:
+                entries[key] = [
+                    writer.value(data), source and _fingerprint(source)
+                ]
+            header = json.dumps(
+                dict(byteorder=sys.byteorder, entries=entries)
+            ).encode("utf8")
+            header_offset = writer.position
+            writer.write(header)
+            f.seek(0)
+            f.write(STORE_PREAMBLE.pack(
+                STORE_MAGIC, STORE_VERSION, header_offset, len(header)
+            ))
@@ -4,13 +4,322 @@ This was necessary to a) add extra stuff like word lists using the
 same mechanism defined by pycorpora and b) include an actual copy of
 the Corpora Project with a packaged Python module.
 """
+import io
 import os
 import sys
 import json
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+from olipy import compiled
+from olipy import jsonstream
+from olipy.randomness import Sampler
 
-cache = dict()
+# The JSON libraries that can turn the bytes of a JSON file into
+# Python objects, fastest first.
+DECODERS = ("orjson", "msgspec", "ujson", "json")
+
+def _import_decoder(name):
+    """Import a JSON library and find its decoding function.
+
+    :return: The function, or None if the library isn't installed.
+    """
+    try:
+        if name == "orjson":
+            import orjson
+            return orjson.loads
+        if name == "msgspec":
+            import msgspec.json
+            return msgspec.json.decode
+        if name == "ujson":
+            import ujson
+            return ujson.loads
+    except ImportError:
+        return None
+    if name == "json":
+        return json.loads
+    return None
+
+# Decoding functions that have been imported, keyed by name.
+decoders = dict(json=json.loads)
+
+# The name of the JSON library in use. If this is None, the fastest
+# one installed is imported and used the first time a corpus is
+# parsed, so a program that never parses JSON doesn't import any.
+decoder_name = None
+
+def _choose_decoder():
+    """Start using the fastest JSON library installed."""
+    global decoder_name
+    for name in DECODERS:
+        decoder = _import_decoder(name)
+        if decoder is not None:
+            decoders[name] = decoder
+            decoder_name = name
+            return name
+
+def set_decoder(name):
+    """Choose which JSON library to use when loading corpora."""
+    global decoder_name
+    if name not in decoders:
+        decoder = _import_decoder(name)
+        if decoder is None:
+            raise ValueError(
+                "Unknown or uninstalled JSON decoder %s; choose among %s" % (
+                    name, ", ".join(DECODERS))
+            )
+        decoders[name] = decoder
+    decoder_name = name
+
+def decode(data):
+    """Parse a JSON document, given as bytes."""
+    name = decoder_name or _choose_decoder()
+    try:
+        return decoders[name](data)
+    except Exception:
+        if name == "json":
+            raise
+        # The faster libraries are stricter than the standard
+        # library (e.g. about NaN), so give it a chance.
+        return json.loads(data)
+
+# The size of an empty string. Each character of an ASCII string
+# adds one byte to this.
+_STR_SIZE = sys.getsizeof("")
+
+def approximate_size(obj):
+    """Estimate how many bytes of memory a parsed JSON object occupies.
+
+    This is quick rather than exact: strings are assumed to be ASCII,
+    and shared objects are counted every time they appear.
+    """
+    if isinstance(obj, str):
+        return _STR_SIZE + len(obj)
+    if isinstance(obj, Mapping):
+        # A frozen corpus's mappings are read-only views of
+        # dictionaries the same size as a copy would be.
+        if isinstance(obj, dict):
+            size = sys.getsizeof(obj)
+        else:
+            size = sys.getsizeof(obj) + sys.getsizeof(dict(obj))
+        return size + _items_size(obj.keys()) + _items_size(obj.values())
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (list, tuple)):
+        size += _items_size(obj)
+    return size
+
+def _items_size(items):
+    if set(map(type, items)) == {str}:
+        # Fast path for the very common case of a list of strings.
+        return len(items) * _STR_SIZE + sum(map(len, items))
+    return sum(map(approximate_size, items))
+
+class _Flight(object):
+    """A corpus that one thread is loading and others are waiting for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class CorpusCache(object):
+    """Keeps recently used corpora in memory, keyed by path.
+
+    By default the cache grows without limit. If `max_entries` or
+    `max_bytes` is set, the least recently used corpora are evicted
+    to stay within the limit. The size of a corpus is estimated with
+    approximate_size(). That can take longer than loading the corpus,
+    so unless `max_bytes` is set, it's put off until stats() is called.
+
+    The cache is safe to use from multiple threads.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.RLock()
+        self.loading = dict()
+        self.clear()
+
+    def clear(self):
+        """Remove everything from the cache and reset the statistics."""
+        with self.lock:
+            self.data = OrderedDict()
+            self.sizes = dict()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def set_limits(self, max_entries=None, max_bytes=None):
+        """Change the limits, evicting corpora if necessary."""
+        with self.lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            if max_bytes is not None:
+                self._measure()
+            self._evict()
+
+    def __contains__(self, path):
+        return path in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        return iter(list(self.data))
+
+    def keys(self):
+        return list(self.data)
+
+    def __getitem__(self, path):
+        with self.lock:
+            value = self.data[path]
+            self.data.move_to_end(path)
+            return value
+
+    def __setitem__(self, path, value):
+        self.set(path, value)
+
+    def __delitem__(self, path):
+        with self.lock:
+            del self.data[path]
+            self.bytes -= self.sizes.pop(path) or 0
+
+    def get(self, path, default=None):
+        """Look up a corpus, keeping track of hits and misses."""
+        with self.lock:
+            if path in self.data:
+                self.hits += 1
+                return self[path]
+            self.misses += 1
+            return default
+
+    def get_or_load(self, path, load):
+        """Look up a corpus, calling load() to get it if it's not cached.
+
+        If several threads ask for the same missing corpus at once,
+        only one of them calls load(); the others wait for the result.
+        If load() returns None, nothing is cached.
+        """
+        with self.lock:
+            if path in self.data:
+                self.hits += 1
+                return self[path]
+            self.misses += 1
+            flight = self.loading.get(path)
+            leader = flight is None
+            if leader:
+                flight = self.loading[path] = _Flight()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = load()
+            if flight.value is not None:
+                self.set(path, flight.value)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.loading[path]
+            flight.done.set()
+        return flight.value
+
+    def set(self, path, value, size=None):
+        if size is None and self.max_bytes is not None:
+            size = approximate_size(value)
+        with self.lock:
+            if path in self.data:
+                del self[path]
+            self.data[path] = value
+            self.sizes[path] = size
+            if size is not None:
+                self.bytes += size
+            self._evict()
+
+    def _measure(self):
+        """Estimate the size of every corpus that hasn't been measured."""
+        for path, value in self.data.items():
+            if self.sizes[path] is None:
+                size = self.sizes[path] = approximate_size(value)
+                self.bytes += size
+
+    def _evict(self):
+        while self.data and (
+            (self.max_entries is not None
+             and len(self.data) > self.max_entries)
+            or (self.max_bytes is not None and self.bytes > self.max_bytes)
+        ):
+            path = next(iter(self.data))
+            del self[path]
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            self._measure()
+            return dict(
+                entries=len(self.data), bytes=self.bytes,
+                max_entries=self.max_entries, max_bytes=self.max_bytes,
+                hits=self.hits, misses=self.misses,
+                evictions=self.evictions,
+            )
+
+class LoadStats(object):
+    """Keeps track of every corpus loaded into memory: where it came
+    from, how many bytes were read, and how long it took.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.corpora = dict()
+
+    def record(self, path, method, bytes_read, seconds, decode_seconds):
+        with self.lock:
+            entry = self.corpora.get(path)
+            if entry is None:
+                entry = self.corpora[path] = dict(
+                    loads=0, bytes_read=0, seconds=0.0, decode_seconds=0.0
+                )
+            entry["method"] = method
+            entry["loads"] += 1
+            entry["bytes_read"] += bytes_read
+            entry["seconds"] += seconds
+            entry["decode_seconds"] += decode_seconds
+
+    def stats(self):
+        with self.lock:
+            corpora = dict(
+                (path, dict(entry)) for path, entry in self.corpora.items()
+            )
+        totals = dict(loads=0, bytes_read=0, seconds=0.0, decode_seconds=0.0)
+        for entry in corpora.values():
+            for key in totals:
+                totals[key] += entry[key]
+        totals["corpora"] = corpora
+        return totals
+
+cache = CorpusCache()
+load_stats = LoadStats()
 loaders = []
 
+# Functions to call whenever a corpus is loaded into memory. Each is
+# called, in the thread that did the loading, with a dictionary
+# describing the load: the path, the method ("store", "compiled" or
+# the name of the JSON decoder), the number of bytes read and the
+# time taken.
+tracers = []
+
 this_dir = os.path.split(__file__)[0]
 data_path = os.path.join(this_dir, "data")
 components = [
@@ -19,13 +328,977 @@ components = [
 ]
 data_directories = [os.path.join(*x) for x in components]
 
-def _read(path):
-    if not path in cache:
+# Where compiled corpora and derived indexes are written. None means
+# compiled corpora go alongside the JSON files they were compiled
+# from, and derived indexes go in a cache directory belonging to the
+# current user (see _user_cache_directory()).
+build_directory = None
+
+# If a corpus has been compiled, load the compiled version instead
+# of parsing the JSON.
+use_compiled = True
+
+# If this is True, every string in a parsed corpus or derived index is
+# interned, so that a word that appears in several corpora is only
+# stored once. This makes loading a little slower.
+use_interning = False
+
+# If this is True, corpora and derived indexes are handed out as
+# read-only tuples and mappings, which are safe to share between
+# callers without copying. Use thaw() to get a copy that can be
+# changed.
+use_frozen = False
+
+# A compiled.CorpusStore to look in before loading corpora from disk.
+# See open_store().
+store = None
+
+# Functions that derive indexes from corpora, keyed by the name of
+# the index. See register_index().
+index_builders = dict()
+
+# The bundled corpora that benefit most from being compiled.
+LARGE_WORD_LISTS = [
+    "english_words", "by_syllable_count", "common_nouns", "common_verbs"
+]
+
+# A listing of every file and directory in data_directories, generated
+# by write_manifest(). If it's present, we consult it instead of the
+# filesystem when looking for corpora.
+manifest_path = os.path.join(data_path, "manifest.json")
+MANIFEST_VERSION = 1
+
+# The bundled corpora packed into a single archive by build_archive().
+# If the corpus directories aren't present, they're read out of here.
+archive_path = os.path.join(data_path, "corpora.zip")
+
+# Archives that have been added with add_source().
+sources = []
+
+class Listing(object):
+    """An in-memory listing of the files and directories beneath a
+    set of root directories.
+
+    Subclasses fill in the listing and say how to open the files.
+    """
+
+    def __init__(self):
+        self.roots = []
+        self.listings = dict()
+        self.files = dict()
+
+    @classmethod
+    def _path(cls, base, relative):
+        return os.path.normpath(os.path.join(base, *relative.split("/")))
+
+    def _add(self, path):
+        parent, name = os.path.split(path)
+        self.listings.setdefault(parent, []).append(name)
+
+    def covers(self, path):
+        """Is `path` somewhere inside one of this listing's directories?"""
+        path = os.path.normpath(path)
+        for root in self.roots:
+            if path == root or path.startswith(root + os.sep):
+                return True
+        return False
+
+    def listdir(self, path):
+        listing = self.listings.get(os.path.normpath(path))
+        if listing is None:
+            raise FileNotFoundError(path)
+        return list(listing)
+
+    def isdir(self, path):
+        return os.path.normpath(path) in self.listings
+
+    def isfile(self, path):
+        return os.path.normpath(path) in self.files
+
+    def open(self, path):
+        """Open a file for reading in binary mode."""
+        return open(path, "rb")
+
+class Manifest(Listing):
+    """A precomputed listing of a set of corpus directories.
+
+    For every directory it knows about, the manifest records the
+    subdirectories (categories) and the JSON files inside, along with
+    the size, top-level keys, description, number of items and SHA-1
+    hash of each file.
+    """
+
+    def __init__(self, data, base=data_path):
+        super(Manifest, self).__init__()
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(
+                "Unsupported manifest version: %s" % data.get("version"))
+        for root, contents in sorted(data["directories"].items()):
+            root = self._path(base, root)
+            self.roots.append(root)
+            self.listings[root] = []
+            for category in contents["categories"]:
+                self._add(self._path(root, category))
+                self.listings[self._path(root, category)] = []
+            for filename, entry in contents["files"].items():
+                path = self._path(root, filename)
+                self._add(path)
+                self.files[path] = entry
+        for listing in self.listings.values():
+            listing.sort()
+
+    @classmethod
+    def load(cls, path=manifest_path):
+        """Load a manifest from disk, or return None if there isn't one."""
         if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(json.load(f), os.path.dirname(path))
+
+    def entry(self, path):
+        """Return what's recorded about a file: see manifest_entry()."""
+        return self.files.get(os.path.normpath(path))
+
+def build_manifest(directories=None, base=data_path):
+    """Scan a set of corpus directories and describe their contents.
+
+    :return: A JSON-serializable dictionary suitable for passing into
+        the Manifest constructor.
+    """
+    directories = directories or data_directories
+    manifest = dict(version=MANIFEST_VERSION, directories=dict())
+    for directory in directories:
+        categories = []
+        files = dict()
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for dirname in dirnames:
+                categories.append(
+                    _relative(os.path.join(dirpath, dirname), directory))
+            for filename in sorted(filenames):
+                if not filename.endswith(".json"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                files[_relative(path, directory)] = manifest_entry(path)
+        manifest["directories"][_relative(directory, base)] = dict(
+            categories=categories, files=files
+        )
+    return manifest
+
+def manifest_entry(path):
+    """Describe one file the way the manifest does: its size, its
+    top-level keys, its description, how many items it holds and its
+    SHA-1 hash.
+
+    The number of items is the length of the file's biggest list or
+    object, or if it has no lists or objects, its number of keys, not
+    counting the description.
+    """
+    with _open(path) as f:
+        raw = f.read()
+    data = json.loads(raw)
+    keys = []
+    description = None
+    values = [data]
+    if isinstance(data, dict):
+        keys = sorted(data.keys())
+        if isinstance(data.get("description"), str):
+            description = data["description"]
+        values = [v for k, v in data.items() if k != "description"]
+    count = max(
+        [len(v) for v in values if isinstance(v, (list, dict))]
+        or [len(values)]
+    )
+    return dict(
+        size=len(raw), keys=keys, description=description, count=count,
+        sha1=_sha1(raw),
+    )
+
+def validate_corpus(path):
+    """Check that a file follows the Corpora Project's conventions: a
+    JSON object with a "description" and at least one other key.
+
+    :return: A 2-tuple (errors, warnings). Errors mean the file can't
+        be loaded at all; warnings mean it breaks the conventions. Many
+        of the bundled corpora have warnings.
+    """
+    try:
+        with _open(path) as f:
+            data = json.loads(f.read().decode("utf8"))
+    except (OSError, UnicodeDecodeError, ValueError) as e:
+        return [str(e)], []
+    return [], _convention_warnings(data)
+
+def _convention_warnings(data):
+    warnings = []
+    if not isinstance(data, dict):
+        warnings.append(
+            "Top-level value is a %s, not an object" % type(data).__name__)
+        return warnings
+    if not isinstance(data.get("description"), str):
+        warnings.append("No description")
+    keys = set(data) - set(["description"])
+    if not keys:
+        warnings.append("No data besides the description")
+    return warnings
+
+def _check_corpus(path):
+    """Load and validate one corpus, timing each step. This runs in a
+    worker process; see check_corpora().
+    """
+    result = dict(
+        path=path, name=os.path.basename(path)[:-5], bytes_read=0,
+        read_seconds=0.0, decode_seconds=0.0, size=None,
+        errors=[], warnings=[],
+    )
+    try:
+        start = time.perf_counter()
+        with _open(path) as f:
+            raw = f.read()
+        result["bytes_read"] = len(raw)
+        result["read_seconds"] = time.perf_counter() - start
+        start = time.perf_counter()
+        data = decode(raw)
+        result["decode_seconds"] = time.perf_counter() - start
+    except Exception as e:
+        result["errors"].append("%s: %s" % (e.__class__.__name__, e))
+        return result
+    result["size"] = approximate_size(data)
+    try:
+        raw.decode("utf8")
+    except UnicodeDecodeError as e:
+        result["errors"].append(str(e))
+    result["warnings"] = _convention_warnings(data)
+    return result
+
+def _start_worker(archives, directories, decoder):
+    """Make a worker process see the same corpora as the process that
+    started it, and parse them with the same JSON library. Under the
+    spawn and forkserver start methods, nothing set up at runtime is
+    inherited. See check_corpora().
+    """
+    data_directories[:] = directories
+    sources[:] = [ArchiveSource(path) for path in archives]
+    if decoder is not None:
+        set_decoder(decoder)
+    refresh()
+
+def check_corpora(names=None, processes=None):
+    """Load and validate many corpora in parallel, using a pool of
+    worker processes.
+
+    :param names: The names of the corpora to check. By default,
+        every corpus is checked.
+    :param processes: The number of worker processes. By default,
+        one per CPU. If this is 1, everything happens in this process.
+
+    :return: A list of dictionaries, one per corpus, in the same order
+        as `names` (or paths()). Each has the corpus's path and name,
+        the number of bytes read, the time spent reading and decoding
+        the file, its approximate size in memory once loaded (see
+        approximate_size()), and lists of errors and warnings (see
+        validate_corpus()).
+    """
+    if names:
+        corpus_paths = [find(name) for name in names]
+        if None in corpus_paths:
+            raise ValueError(
+                "No corpus named %s" % names[corpus_paths.index(None)])
+    else:
+        corpus_paths = list(paths())
+    if processes == 1:
+        return [_check_corpus(path) for path in corpus_paths]
+    # Send the corpora to the workers in batches, so that the many
+    # small ones don't each cost a round trip.
+    workers = processes or os.cpu_count() or 1
+    chunksize = max(1, len(corpus_paths) // (workers * 4))
+    # Importing this is slow, so wait until it's needed.
+    from concurrent.futures import ProcessPoolExecutor
+    settings = (
+        [source.path for source in sources], list(data_directories),
+        decoder_name
+    )
+    with ProcessPoolExecutor(
+        processes, initializer=_start_worker, initargs=settings
+    ) as pool:
+        return list(
+            pool.map(_check_corpus, corpus_paths, chunksize=chunksize)
+        )
+
+def write_manifest(path=manifest_path, directories=None):
+    """Regenerate the manifest file. Run this whenever the data changes."""
+    data = build_manifest(directories, os.path.dirname(path))
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write("\n")
+    return data
+
+def _relative(path, base):
+    return os.path.relpath(path, base).replace(os.sep, "/")
+
+def _get_manifest():
+    """Load the manifest the first time it's needed.
+
+    Setting corpora.manifest to None disables it.
+    """
+    module = sys.modules[__name__]
+    if not "manifest" in module.__dict__:
+        module.manifest = Manifest.load()
+    return module.manifest
+
+class ArchiveSource(Listing):
+    """Serves corpora out of a zip or tar archive.
+
+    The archive is treated as a directory: a file stored in the
+    archive as "words/nouns.json" is found at
+    os.path.join(path, "words", "nouns.json"). The archive isn't
+    opened until something inside it is needed.
+    """
+
+    def __init__(self, path):
+        super(ArchiveSource, self).__init__()
+        self.path = os.path.normpath(path)
+        self.roots.append(self.path)
+        self.archive = None
+        self.lock = threading.RLock()
+
+    def _open_archive(self):
+        if self.archive is not None:
             return
-        data = json.load(open(path))
-        cache[path] = data
-    return cache[path]
+        with self.lock:
+            if self.archive is not None:
+                return
+            import tarfile
+            import zipfile
+            self.zipped = zipfile.is_zipfile(self.path)
+            if self.zipped:
+                archive = zipfile.ZipFile(self.path)
+                members = [
+                    (x.filename, x.is_dir(), x) for x in archive.infolist()
+                ]
+            else:
+                archive = tarfile.open(self.path)
+                members = [
+                    (x.name, x.isdir(), x) for x in archive.getmembers()
+                    if x.isdir() or x.isfile()
+                ]
+            self.listings[self.path] = []
+            for name, is_dir, member in members:
+                path = self._path(self.path, name.strip("/"))
+                if path == self.path or not self.covers(path):
+                    continue
+                if is_dir:
+                    self._add_directory(path)
+                else:
+                    self._add_directory(os.path.dirname(path))
+                    self._add(path)
+                    self.files[path] = member
+            for listing in self.listings.values():
+                listing.sort()
+            self.archive = archive
+
+    def _add_directory(self, path):
+        # Archives don't always have entries for directories, so
+        # create any that are missing, along with their parents.
+        while path not in self.listings:
+            self.listings[path] = []
+            self._add(path)
+            path = os.path.dirname(path)
+
+    def listdir(self, path):
+        self._open_archive()
+        return super(ArchiveSource, self).listdir(path)
+
+    def isdir(self, path):
+        self._open_archive()
+        return super(ArchiveSource, self).isdir(path)
+
+    def isfile(self, path):
+        self._open_archive()
+        return super(ArchiveSource, self).isfile(path)
+
+    def open(self, path):
+        self._open_archive()
+        member = self.files.get(os.path.normpath(path))
+        if member is None:
+            raise FileNotFoundError(path)
+        if self.zipped:
+            return self.archive.open(member)
+        # Everything in a tar archive is read through one file handle,
+        # so read the whole file while no other thread can move it.
+        with self.lock:
+            return io.BytesIO(self.archive.extractfile(member).read())
+
+def add_source(path, first=False):
+    """Look for corpora in another directory or archive.
+
+    :param path: A directory, or a zip or tar archive. An archive is
+        treated as a directory containing whatever's in the archive.
+    :param first: If this is True, corpora found here take precedence
+        over corpora of the same name found elsewhere.
+
+    :return: The directory that was added to data_directories.
+    """
+    import tarfile
+    import zipfile
+    path = os.path.normpath(path)
+    if os.path.isfile(path):
+        # Archives are opened lazily, so make sure this is one now,
+        # rather than breaking every lookup later.
+        if not (zipfile.is_zipfile(path) or tarfile.is_tarfile(path)):
+            raise ValueError("%s is not a zip or tar archive" % path)
+        sources.insert(0, ArchiveSource(path))
+    elif not os.path.isdir(path):
+        raise ValueError("No directory or archive at %s" % path)
+    if first:
+        data_directories.insert(0, path)
+    else:
+        data_directories.append(path)
+    refresh()
+    return path
+
+def build_archive(path=archive_path, directories=None, base=data_path):
+    """Pack corpus directories into a single compressed zip archive.
+
+    If the bundled corpus directories are missing but there's an
+    archive at archive_path, the bundled corpora are read out of the
+    archive instead.
+    """
+    import zipfile
+    directories = directories or data_directories
+    temporary = "%s.%d.tmp" % (path, os.getpid())
+    with zipfile.ZipFile(temporary, "w", zipfile.ZIP_DEFLATED) as archive:
+        for directory in directories:
+            for dirpath, dirnames, filenames in os.walk(directory):
+                dirnames.sort()
+                archive.write(dirpath, _relative(dirpath, base))
+                for filename in sorted(filenames):
+                    if filename.endswith(".json"):
+                        filepath = os.path.join(dirpath, filename)
+                        archive.write(filepath, _relative(filepath, base))
+    os.replace(temporary, path)
+    return path
+
+if not os.path.isdir(data_directories[0]) and os.path.exists(archive_path):
+    sources.append(ArchiveSource(archive_path))
+    data_directories = [
+        os.path.join(archive_path, *x[1:]) for x in components
+    ]
+
+def _source_for(path):
+    """Find the listing that knows about `path`, or None if the
+    filesystem should be consulted directly.
+    """
+    for source in sources:
+        if source.covers(path):
+            return source
+    manifest = _get_manifest()
+    if manifest and manifest.covers(path):
+        return manifest
+    return None
+
+# These helpers answer questions about the filesystem using an
+# archive or the manifest if possible, and the real filesystem
+# otherwise.
+def _listdir(directory):
+    source = _source_for(directory)
+    if source:
+        return source.listdir(directory)
+    return os.listdir(directory)
+
+def _isdir(path):
+    source = _source_for(path)
+    if source:
+        return source.isdir(path)
+    return os.path.isdir(path)
+
+def _isfile(path):
+    source = _source_for(path)
+    if source:
+        return source.isfile(path)
+    return os.path.isfile(path)
+
+def _open(path):
+    source = _source_for(path)
+    if source:
+        return source.open(path)
+    return open(path, "rb")
+
+def _real_path(path):
+    """Find the file on disk whose modification time tells whether
+    the corpus at `path` has changed.
+    """
+    source = _source_for(path)
+    if isinstance(source, ArchiveSource):
+        return source.path
+    return path
+
+def _read(path):
+    return cache.get_or_load(path, lambda: _load(path))
+
+# These modules are only needed now and then, and importing them
+# slows down importing this one, so they're imported when they're
+# first used.
+
+def _logger():
+    import logging
+    return logging.getLogger(__name__)
+
+def _sha1(data):
+    import hashlib
+    return hashlib.sha1(data).hexdigest()
+
+def _load(path):
+    """Load a corpus from the fastest available source."""
+    if not _isfile(path):
+        return None
+    start = time.perf_counter()
+    data = None
+    bytes_read = 0
+    decode_seconds = 0.0
+    if store is not None:
+        data = store.get(_store_key(path), _real_path(path))
+        method = "store"
+    if data is None and use_compiled:
+        data = _read_compiled(path)
+        method = "compiled"
+    if data is None:
+        with _open(path) as f:
+            raw = f.read()
+        bytes_read = len(raw)
+        decode_start = time.perf_counter()
+        data = decode(raw)
+        decode_seconds = time.perf_counter() - decode_start
+        method = decoder_name
+        if use_interning:
+            data = _interned(data)
+    if use_frozen:
+        data = _frozen(data)
+    seconds = time.perf_counter() - start
+    load_stats.record(path, method, bytes_read, seconds, decode_seconds)
+    _logger().debug(
+        "Loaded %s (%s, %d bytes) in %.2f ms", path, method, bytes_read,
+        seconds * 1000
+    )
+    if tracers:
+        event = dict(
+            path=path, method=method, bytes_read=bytes_read,
+            seconds=seconds, decode_seconds=decode_seconds
+        )
+        for tracer in tracers:
+            # A broken tracer shouldn't stop the corpus from loading,
+            # in this thread or any other thread waiting for it.
+            try:
+                tracer(event)
+            except Exception:
+                _logger().exception("Tracer %r failed", tracer)
+    return data
+
+def _parse(path):
+    with _open(path) as f:
+        return decode(f.read())
+
+def _interned(obj):
+    """Intern every string in a parsed JSON object.
+
+    Lists and dictionaries are modified in place.
+    """
+    if isinstance(obj, str):
+        return sys.intern(obj)
+    if isinstance(obj, list):
+        if set(map(type, obj)) == {str}:
+            obj[:] = map(sys.intern, obj)
+        else:
+            obj[:] = map(_interned, obj)
+    elif isinstance(obj, dict):
+        items = [
+            (_interned(key), _interned(value)) for key, value in obj.items()
+        ]
+        obj.clear()
+        obj.update(items)
+    return obj
+
+_SCALARS = {str, int, float, bool, type(None)}
+
+def _frozen(obj):
+    """Turn the lists and dictionaries in a parsed JSON object into
+    tuples and read-only mappings.
+    """
+    if isinstance(obj, list):
+        if set(map(type, obj)) <= _SCALARS:
+            return tuple(obj)
+        return tuple(map(_frozen, obj))
+    if isinstance(obj, dict):
+        return MappingProxyType(
+            dict((key, _frozen(value)) for key, value in obj.items())
+        )
+    return obj
+
+def thaw(obj):
+    """Make a copy of a corpus that can be changed.
+
+    Read-only sequences and mappings, like those handed out when
+    use_frozen is set or when reading from a store, become lists and
+    dictionaries.
+    """
+    if isinstance(obj, str):
+        return obj
+    if isinstance(obj, Mapping):
+        return dict((key, thaw(value)) for key, value in obj.items())
+    if isinstance(obj, Sequence):
+        return [thaw(x) for x in obj]
+    return obj
+
+def stats():
+    """Describe the corpora that have been loaded so far.
+
+    :return: A dictionary with the cache's statistics (see
+        CorpusCache.stats()), the totals for every corpus loaded
+        (number of loads, bytes read, total seconds and seconds spent
+        decoding JSON), and under "corpora", the same figures for each
+        corpus, keyed by path, along with its approximate size in
+        memory if it's in the cache.
+    """
+    result = cache.stats()
+    result.update(load_stats.stats())
+    with cache.lock:
+        sizes = dict(cache.sizes)
+    for path, entry in result["corpora"].items():
+        entry["size"] = sizes.get(path)
+    return result
+
+def _build_path(path, extension):
+    """Find where to put a file derived from the corpus at `path`."""
+    base = os.path.splitext(path)[0]
+    directory = build_directory
+    if directory is None:
+        source = _source_for(path)
+        if not isinstance(source, ArchiveSource):
+            return base + extension
+        # Nothing can be written inside an archive, so use the
+        # directory the archive is in.
+        directory = os.path.dirname(source.path)
+    return _unique_path(directory, path, extension)
+
+def _unique_path(directory, path, extension):
+    """Name a file in `directory` derived from the corpus at `path`,
+    in a way that won't clash with files derived from other corpora
+    with the same name.
+    """
+    base = os.path.splitext(os.path.basename(path))[0]
+    digest = _sha1(os.path.abspath(path).encode("utf8"))
+    return os.path.join(
+        directory, "%s-%s%s" % (base, digest[:12], extension)
+    )
+
+def _user_cache_directory():
+    """Find the directory where this user's derived indexes are saved."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(
+            os.path.join("~", "AppData", "Local"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser(os.path.join("~", "Library", "Caches"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+            os.path.join("~", ".cache"))
+    return os.path.join(base, "olipy")
+
+def _index_path(path, name):
+    # Indexes are never saved next to the corpus: a directory of
+    # corpora isn't necessarily writable, and anything found there
+    # could have been put there by someone else.
+    directory = build_directory or _user_cache_directory()
+    return _unique_path(directory, path, ".%s.index" % name)
+
+def _compiled_path(path):
+    return _build_path(path, ".compiled")
+
+def _read_compiled(path):
+    compiled_path = _compiled_path(path)
+    if not os.path.exists(compiled_path):
+        return None
+    return compiled.load(compiled_path, _real_path(path))
+
+def compile_corpus(name):
+    """Write a compiled version of the named corpus.
+
+    From then on, its large lists of strings are memory-mapped rather
+    than parsed. See olipy.compiled for details.
+
+    :return: The path to the compiled file.
+    """
+    path = find(name)
+    if path is None:
+        raise ValueError("No corpus named %s" % name)
+    return _compile(path)
+
+def _compile(path):
+    data = _parse(path)
+    compiled_path = _compiled_path(path)
+    if build_directory is not None and not os.path.isdir(build_directory):
+        os.makedirs(build_directory)
+    compiled.write(compiled_path, data, _real_path(path))
+    if path in cache:
+        del cache[path]
+    return compiled_path
+
+def compile_corpora(names=None):
+    """Compile a number of corpora, by default LARGE_WORD_LISTS."""
+    return [compile_corpus(name) for name in names or LARGE_WORD_LISTS]
+
+def register_index(name, corpus, build, version=1):
+    """Register a function that derives an index from a corpus.
+
+    :param name: The name of the index, to be passed into index().
+    :param corpus: The name of the corpus the index is built from.
+    :param build: A function that takes the parsed corpus and returns
+        the index. To be saved to disk, the index must be made of
+        nothing but dictionaries, lists, tuples, sets, strings and
+        numbers; anything else is rebuilt every time the process
+        starts.
+    :param version: Change this whenever `build` changes, so that
+        indexes saved by the old version aren't used.
+    """
+    index_builders[name] = (corpus, build, version)
+
+def index(name):
+    """Get a derived index, building it if necessary.
+
+    The first time an index is built, it's saved in build_directory
+    (or, if that's not set, a per-user cache directory), tagged with a
+    hash of the corpus contents. After that it's loaded from disk,
+    until the corpus changes.
+    """
+    if name not in index_builders:
+        raise ValueError("No index named %s" % name)
+    corpus, build, version = index_builders[name]
+    path = find(corpus)
+    if path is None:
+        raise ValueError("No corpus named %s" % corpus)
+    return cache.get_or_load(
+        "%s#%s" % (path, name),
+        lambda: _load_index(name, path, build, version)
+    )
+
+def _load_index(name, path, build, version):
+    value = _read_index(name, path, build, version)
+    if use_interning:
+        value = _interned(value)
+    if use_frozen:
+        value = _frozen(value)
+    return value
+
+def _read_index(name, path, build, version):
+    # Indexes are saved with marshal rather than pickle, because
+    # loading a pickle can run arbitrary code.
+    import marshal
+    key = "%s:%s:%s" % (name, _content_hash(path), version)
+    index_path = _index_path(path, name)
+    try:
+        # marshal.load() reads a file in tiny pieces, so read it all
+        # at once.
+        with open(index_path, "rb") as f:
+            saved_key, value = marshal.loads(f.read())
+        if saved_key == key:
+            return value
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    value = build(_read(path))
+    try:
+        data = marshal.dumps((key, value))
+    except ValueError:
+        # This index contains something that can't be saved. It will
+        # be built again next time.
+        return value
+    # Write to a temporary file and move it into place, so another
+    # process never sees a partly written index.
+    temporary = "%s.%d.tmp" % (index_path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, index_path)
+    except OSError:
+        # We can't write here. The index will be built again next time.
+        pass
+    return value
+
+def _content_hash(path):
+    entry = _get_manifest() and _get_manifest().entry(path)
+    if entry and "sha1" in entry:
+        return entry["sha1"]
+    with _open(path) as f:
+        return _sha1(f.read())
+
+class Preloader(object):
+    """Loads corpora and derived indexes into the cache, keeping
+    track of how long each one takes.
+
+    :param paths: Paths to the corpora to load.
+    :param indexes: Names of the derived indexes to build.
+    :param progress: A function to call after each item is loaded. It
+        will be passed this Preloader, the path or index name, and the
+        number of seconds it took.
+    """
+
+    def __init__(self, paths, indexes=None, progress=None):
+        self.paths = list(paths)
+        self.indexes = list(indexes or [])
+        self.progress = progress
+        self.timings = OrderedDict()
+        self.errors = dict()
+        self.thread = None
+        self.finished = threading.Event()
+
+    @property
+    def total(self):
+        return len(self.paths) + len(self.indexes)
+
+    @property
+    def completed(self):
+        return len(self.timings) + len(self.errors)
+
+    @property
+    def seconds(self):
+        return sum(self.timings.values())
+
+    def run(self):
+        try:
+            for path in self.paths:
+                self._load(path, _read, path)
+            for name in self.indexes:
+                self._load(name, index, name)
+        finally:
+            self.finished.set()
+
+    def _load(self, item, function, argument):
+        start = time.perf_counter()
+        try:
+            function(argument)
+        except Exception as e:
+            self.errors[item] = e
+        else:
+            self.timings[item] = time.perf_counter() - start
+        if self.progress:
+            self.progress(self, item, time.perf_counter() - start)
+
+    def start(self):
+        """Start loading in a background thread."""
+        self.thread = threading.Thread(
+            target=self.run, name="olipy corpus preloader", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Wait for loading to finish.
+
+        :return: True if loading has finished.
+        """
+        return self.finished.wait(timeout)
+
+    def __repr__(self):
+        return "<Preloader: %d/%d loaded in %.2fs, %d errors>" % (
+            self.completed, self.total, self.seconds, len(self.errors)
+        )
+
+def preload(names=None, categories=None, indexes=None, in_background=False,
+            progress=None):
+    """Load corpora into the cache ahead of time.
+
+    :param names: The names of corpora to load.
+    :param categories: Load every corpus in these categories, e.g.
+        "words" or "words/literature".
+    :param indexes: Names of derived indexes to build. By default, every
+        registered index derived from one of the preloaded corpora.
+    :param in_background: If true, load in a background thread and
+        return immediately.
+    :param progress: Passed into the Preloader constructor.
+
+    If neither `names` nor `categories` is given, every corpus is
+    loaded.
+
+    In a pre-fork server, calling this in the parent process means the
+    children start out sharing its parsed corpora. (Calling gc.freeze()
+    before forking keeps the garbage collector from touching, and thus
+    copying, that memory.)
+
+    :return: A Preloader. If it's running in the background, call its
+        wait() method to wait for it to finish.
+    """
+    paths_to_load = []
+    for name in names or []:
+        path = find(name)
+        if path is None:
+            raise ValueError("No corpus named %s" % name)
+        paths_to_load.append(path)
+    for category in categories or []:
+        parts = category.split("/")
+        loader = _category_loaders().get(parts[0].replace("-", "_"))
+        for part in parts[1:]:
+            if loader is None:
+                break
+            loader = CorpusLoader(*[
+                os.path.join(directory, part)
+                for directory in loader.directories
+                if _isdir(os.path.join(directory, part))
+            ])
+            if not loader.directories:
+                loader = None
+        if loader is None:
+            raise ValueError("No category named %s" % category)
+        paths_to_load.extend(loader.paths())
+    if not names and not categories:
+        paths_to_load = list(paths())
+
+    if indexes is None:
+        preloading = set(paths_to_load)
+        indexes = [
+            name for name, (corpus, build, version) in index_builders.items()
+            if find(corpus) in preloading
+        ]
+
+    preloader = Preloader(paths_to_load, indexes, progress)
+    if in_background:
+        return preloader.start()
+    preloader.run()
+    return preloader
+
+def _store_key(path):
+    return _relative(path, data_path)
+
+def build_store(path, names=None):
+    """Pack corpora into a single memory-mappable file.
+
+    :param names: The names of the corpora to include. By default,
+        every corpus is included.
+    """
+    if names:
+        corpus_paths = [find(name) for name in names]
+        if None in corpus_paths:
+            raise ValueError(
+                "No corpus named %s" % names[corpus_paths.index(None)])
+    else:
+        corpus_paths = list(paths())
+    compiled.CorpusStore.write(
+        path, (
+            (_store_key(x), _parse(x), _real_path(x)) for x in corpus_paths
+        )
+    )
+    return path
+
+def open_store(path):
+    """Serve corpora out of a file created by build_store().
+
+    Corpora found in the store are returned as read-only views of
+    memory that's shared with every other process using the same
+    store. In a pre-fork server, the store can be opened in the
+    parent process before the workers are forked.
+    """
+    global store
+    store = compiled.CorpusStore(path)
+    cache.clear()
+    return store
 
 def fetch_resource(name, *directories):
     directories = directories or data_directories
@@ -43,10 +1316,10 @@ def get_categories(name=None, *directories):
     for directory in directories:
         if name:
             directory = os.path.join(directory, name)
-        if not os.path.isdir(directory):
+        if not _isdir(directory):
             continue
-        for x in os.listdir(directory):
-            if os.path.isdir(os.path.join(directory, x)):
+        for x in _listdir(directory):
+            if _isdir(os.path.join(directory, x)):
                 categories.append(x)
         return categories
 
@@ -56,30 +1329,252 @@ def get_files(name=None, *directories):
     for directory in directories:
         if name:
             directory = os.path.join(directory, name)
-        if not os.path.isdir(directory):
+        if not _isdir(directory):
             continue
-        for x in os.listdir(directory):
+        for x in _listdir(directory):
             path = os.path.join(directory, x)
-            if (not os.path.isdir(path) and path.endswith(".json")):
+            if (not _isdir(path) and path.endswith(".json")):
                 files.append(x[:-5])
     return files
 
 def get_file(*components):
     return fetch_resource(os.path.join(*components) + ".json")
 
+def _stream(path, key=None):
+    if not path in cache and not (store and _store_key(path) in store):
+        if not _isfile(path):
+            raise ValueError("No corpus at %s" % path)
+        with io.TextIOWrapper(_open(path), encoding="utf8") as f:
+            for item in jsonstream.iterate(f, key):
+                yield item
+        return
+    # The corpus is already in memory, or it can be read without
+    # being parsed.
+    data = _read(path)
+    if key is not None:
+        data = data[key]
+    if isinstance(data, Mapping):
+        data = data.items()
+    for item in data:
+        yield item
+
+def iterate(name, key=None):
+    """Iterate over a corpus without loading all of it into memory.
+
+    :param key: Iterate over the value of this key in the corpus,
+        rather than the corpus as a whole.
+
+    Lists yield their items; objects yield (key, value) 2-tuples. See
+    olipy.jsonstream for details.
+    """
+    path = find(name)
+    if path is None:
+        raise ValueError("No corpus named %s" % name)
+    return _stream(path, key)
+
+def _name_index():
+    """Map each corpus name to the paths of every corpus with that
+    name, in the order load() considers them.
+    """
+    global _names
+    _category_loaders()
+    if _names is None:
+        names = dict()
+        for path in paths():
+            name = os.path.basename(path)[:-5]
+            names.setdefault(name, []).append(path)
+        _names = names
+    return _names
+
+# Corpora being loaded by aload() and aget(), keyed by event loop
+# and path.
+_pending = dict()
+
+async def _aread(path):
+    # Importing asyncio is slow, and most programs never get here.
+    import asyncio
+    if path in cache:
+        return _read(path)
+    loop = asyncio.get_running_loop()
+    key = (loop, path)
+    future = _pending.get(key)
+    if future is None:
+        future = loop.run_in_executor(None, _read, path)
+        _pending[key] = future
+        future.add_done_callback(lambda f: _pending.pop(key, None))
+    # If one of several coroutines waiting on this corpus is
+    # cancelled, the others should still get it.
+    return await asyncio.shield(future)
+
+async def aload(name):
+    """Like load(), but the corpus is read and parsed in a worker
+    thread so the event loop isn't blocked.
+
+    Coroutines that ask for the same corpus at the same time share a
+    single load. The result goes into the same cache used by load().
+    """
+    path = find(name)
+    if path:
+        return await _aread(path)
+
+def find(name):
+    """Find the path to the first corpus with the given name."""
+    found = _name_index().get(name)
+    if found:
+        return found[0]
+
+def duplicate_names():
+    """Find names shared by more than one corpus.
+
+    load() will only ever find the first of these.
+
+    :return: A dictionary mapping each ambiguous name to the paths
+        of all the corpora with that name.
+    """
+    return dict(
+        (name, found) for name, found in _name_index().items()
+        if len(found) > 1
+    )
+
 def load(name):
     """Find the first corpus with the given name and load it from disk."""
-    for loader in loaders:
-        value = loader.search(name)
-        if value:
-            return value
+    path = find(name)
+    if path:
+        return _read(path)
+
+def paths():
+    """Generate the path to every corpus."""
+    for loader in _category_loaders().values():
+        for path in loader.paths():
+            yield path
 
 def names():
     """Generate a list of all corpus names."""
-    for loader in loaders:
+    for loader in _category_loaders().values():
         for name in loader.names:
             yield name
 
+# A description of a corpus, as returned by query().
+CorpusInfo = namedtuple(
+    "CorpusInfo", "name category path size keys count description"
+)
+
+class Catalog(object):
+    """Information about every corpus, indexed so that it can be
+    searched without loading anything.
+
+    The information comes from the manifest. Corpora the manifest
+    doesn't cover are read once, when the catalog is built.
+    """
+
+    WORD = re.compile(r"\w+")
+
+    def __init__(self):
+        manifest = _get_manifest()
+        self.corpora = []
+        self.by_category = dict()
+        self.by_key = dict()
+        self.by_word = dict()
+        for path in paths():
+            entry = manifest and manifest.entry(path)
+            if not entry or "count" not in entry:
+                entry = manifest_entry(path)
+            info = CorpusInfo(
+                name=os.path.basename(path)[:-5],
+                category=self._category(path),
+                path=path, size=entry["size"], keys=entry["keys"],
+                count=entry["count"], description=entry["description"],
+            )
+            position = len(self.corpora)
+            self.corpora.append(info)
+            # A corpus in words/literature is also in words.
+            parts = info.category.split("/")
+            for i in range(1, len(parts) + 1):
+                self._index(self.by_category, "/".join(parts[:i]), position)
+            for key in info.keys:
+                self._index(self.by_key, key, position)
+            for word in self.WORD.findall((info.description or "").lower()):
+                self._index(self.by_word, word, position)
+
+    @classmethod
+    def _category(cls, path):
+        directory = os.path.dirname(path)
+        for root in data_directories:
+            if directory.startswith(root + os.sep):
+                return _relative(directory, root)
+        return ""
+
+    @classmethod
+    def _index(cls, index, value, position):
+        index.setdefault(value, set()).add(position)
+
+    def query(self, name=None, category=None, key=None, description=None,
+              min_count=None, max_count=None, min_size=None, max_size=None):
+        """Find the corpora that match every one of the given criteria.
+
+        :param name: Part of the corpus name, ignoring case.
+        :param category: A category like "words" or "words/literature".
+            Corpora in subcategories are included.
+        :param key: A top-level key the corpus must have.
+        :param description: Words that must all appear in the
+            corpus's description, ignoring case.
+        :param min_count: The fewest items the corpus may hold (see
+            manifest_entry()).
+        :param max_count: The most items the corpus may hold.
+        :param min_size: The smallest file size, in bytes.
+        :param max_size: The largest file size, in bytes.
+
+        :return: A list of CorpusInfo objects.
+        """
+        candidates = None
+        filters = []
+        if category is not None:
+            filters.append(self.by_category.get(category.strip("/"), set()))
+        if key is not None:
+            filters.append(self.by_key.get(key, set()))
+        if description is not None:
+            for word in self.WORD.findall(description.lower()):
+                filters.append(self.by_word.get(word, set()))
+        for positions in filters:
+            if candidates is None:
+                candidates = set(positions)
+            else:
+                candidates &= positions
+        if candidates is None:
+            candidates = range(len(self.corpora))
+        if name is not None:
+            name = name.lower()
+        results = []
+        for position in sorted(candidates):
+            info = self.corpora[position]
+            if name is not None and name not in info.name.lower():
+                continue
+            if min_count is not None and info.count < min_count:
+                continue
+            if max_count is not None and info.count > max_count:
+                continue
+            if min_size is not None and info.size < min_size:
+                continue
+            if max_size is not None and info.size > max_size:
+                continue
+            results.append(info)
+        return results
+
+def _get_catalog():
+    global _catalog
+    _category_loaders()
+    if _catalog is None:
+        _catalog = Catalog()
+    return _catalog
+
+def query(**criteria):
+    """Search the corpora by name, category, top-level key,
+    description, number of items or file size, without loading them.
+
+    See Catalog.query() for the criteria.
+    """
+    return _get_catalog().query(**criteria)
+
 class CorpusLoader(object):
     def __init__(self, *directories):
         self.directories = list(directories)
@@ -91,9 +1586,9 @@ class CorpusLoader(object):
     def children(self):
         by_filename = {}
         for directory in self.directories:
-            for filename in sorted(os.listdir(directory)):
+            for filename in sorted(_listdir(directory)):
                 path = os.path.join(directory, filename)
-                if not os.path.isdir(path):
+                if not _isdir(path):
                     continue
                 loader = by_filename.get(filename)
                 if not loader:
@@ -106,22 +1601,64 @@ class CorpusLoader(object):
     @property
     def names(self):
         for directory in self.directories:
-            for filename in sorted(os.listdir(directory)):
-                path = os.path.join(directory, filename)
-                if os.path.isdir(path):
-                    continue
-                if not path.endswith(".json"):
-                    continue
-                yield filename[:-5]
+            for name in self._names_in(directory):
+                yield name
 
-    def search(self, name):
-        for filename in self.names:
-            if name == filename:
-                return self.__getattr__(name)
+    def _names_in(self, directory):
+        for filename in sorted(_listdir(directory)):
+            path = os.path.join(directory, filename)
+            if _isdir(path):
+                continue
+            if not path.endswith(".json"):
+                continue
+            yield filename[:-5]
+
+    def paths(self):
+        """Generate the path to every corpus in this category and its
+        subcategories.
+        """
+        for directory in self.directories:
+            for name in self._names_in(directory):
+                yield os.path.join(directory, name + ".json")
+        for loader in self.children:
+            for path in loader.paths():
+                yield path
+
+    def find(self, name):
+        """Find the path to the first corpus with the given name."""
+        for directory in self.directories:
+            path = os.path.join(directory, name + ".json")
+            if _isfile(path):
+                return path
         for loader in self.children:
-            value = loader.search(name)
-            if value:
-                return value
+            path = loader.find(name)
+            if path:
+                return path
+
+    def search(self, name):
+        path = self.find(name)
+        if path:
+            return _read(path)
+
+    async def aget(self, attr):
+        """Like getattr(), but if `attr` designates a file, it's read
+        and parsed in a worker thread. See aload().
+        """
+        for directory in self.directories:
+            path = os.path.join(directory, attr + '.json')
+            if _isfile(path):
+                return await _aread(path)
+        return self.__getattr__(attr)
+
+    def stream(self, attr, key=None):
+        """Iterate over the corpus `attr` without loading all of it into
+        memory. See iterate().
+        """
+        for directory in self.directories:
+            path = os.path.join(directory, attr + '.json')
+            if _isfile(path):
+                return _stream(path, key)
+        raise AttributeError("no resource named " + attr)
 
     def __getattr__(self, attr):
         """If `attr` designates a file, load it as JSON and return it."""
@@ -129,9 +1666,9 @@ class CorpusLoader(object):
         for directory in self.directories:
             file_loc =os.path.join(directory, attr + '.json')
             dir_loc = os.path.join(directory, attr)
-            if os.path.exists(file_loc):
+            if _isfile(file_loc):
                 return _read(file_loc)
-            elif os.path.isdir(dir_loc):
+            elif _isdir(dir_loc):
                 if not loader:
                     loader = CorpusLoader()
                 loader.directories.append(dir_loc)
@@ -149,18 +1686,72 @@ class CorpusLoader(object):
         path = os.path.join(*components)
         return _read(path)
 
-# Load the standard corpora data from corpora-original/data and the
-# olipy extensions from corpora-more.
-module = sys.modules[__name__]
-for subdir in data_directories:
-    for resource_type in sorted(os.listdir(subdir)):
-        directory = os.path.join(subdir, resource_type)
-        if not os.path.isdir(directory):
-            continue
-        var = resource_type.replace("-", "_")
-        loader = getattr(module, var, None)
-        if not loader:
-            loader = CorpusLoader()
-            loaders.append(loader)
-            setattr(module, var, loader)
-        loader.directories.append(directory)
+# The top-level CorpusLoaders, keyed by the name of the module
+# attribute used to access them. This is populated the first time
+# it's needed, rather than at import time.
+_categories = None
+
+# An index of corpus names; see _name_index().
+_names = None
+
+# Information about every corpus; see query().
+_catalog = None
+
+# The data directories and manifest that _categories and _names were
+# built from. If either changes, they're rebuilt.
+_built_from = None
+
+def refresh():
+    """Forget everything known about the contents of the data
+    directories.
+
+    Changes to data_directories and the manifest are noticed
+    automatically, but if you add or remove corpus files in a
+    directory that's not covered by the manifest, call this.
+    """
+    global _categories, _names, _catalog, _built_from
+    _categories = None
+    _names = None
+    _catalog = None
+    _built_from = None
+
+def _category_loaders():
+    """Find the standard corpora data from corpora-original/data and the
+    olipy extensions from corpora-olipy, and create a CorpusLoader for
+    each top-level category.
+    """
+    global _categories, _built_from
+    if _built_from != (data_directories, _get_manifest()):
+        refresh()
+        _built_from = (list(data_directories), _get_manifest())
+    if _categories is None:
+        categories = dict()
+        for subdir in data_directories:
+            for resource_type in sorted(_listdir(subdir)):
+                directory = os.path.join(subdir, resource_type)
+                if not _isdir(directory):
+                    continue
+                var = resource_type.replace("-", "_")
+                loader = categories.get(var)
+                if not loader:
+                    loader = CorpusLoader()
+                    categories[var] = loader
+                loader.directories.append(directory)
+        loaders[:] = categories.values()
+        _categories = categories
+    return _categories
+
+def __getattr__(name):
+    """Materialize the manifest and the category loaders on demand."""
+    if name == "manifest":
+        return _get_manifest()
+    loader = _category_loaders().get(name)
+    if loader is None:
+        raise AttributeError(
+            "module %r has no attribute %r" % (__name__, name))
+    # The loader isn't stored as a module attribute, because the
+    # categories change if data_directories does.
+    return loader
+
+def __dir__():
+    return sorted(set(globals()) | set(_category_loaders()))
@@ -79,7 +79,19 @@ class Eater:
 
 class NeedsWordList(Eater):
     """An eater that requires a word list to operate."""
+
+    # The name of a derived index (see corpora.register_index) holding
+    # the result of processing the default word list with the
+    # process_word_list() of the class that sets this. If this is set,
+    # the default word list itself is never loaded, and word_list is
+    # None.
+    DEFAULT_INDEX = None
+
     def __init__(self, words=None):
+        if not words and self._default_index_applies():
+            self.word_list = None
+            self.use_index(corpora.index(self.DEFAULT_INDEX))
+            return
         if not words:
             words = self._load_corpus("english_words", "words")
         self.word_list = words
@@ -88,6 +100,20 @@ class NeedsWordList(Eater):
     def process_word_list(self, word_list):
         return word_list
 
+    def _default_index_applies(self):
+        # A subclass that processes the word list differently can't
+        # use the index its superclass's method built.
+        cls = type(self)
+        for base in cls.__mro__:
+            if "DEFAULT_INDEX" in vars(base):
+                return (base.DEFAULT_INDEX is not None and
+                        cls.process_word_list is base.process_word_list)
+        return False
+
+    def use_index(self, index):
+        """Use a precomputed result of process_word_list()."""
+        self.words = index
+
     @classmethod
     def from_file(cls, filename):
         words = [i.strip() for i in open(filename)]
@@ -95,7 +121,10 @@ class NeedsWordList(Eater):
 
     @classmethod
     def _load_corpus(cls, corpus_name, key=None):
-        data = corpora.load(corpus_name)
+        return cls._words_from(corpora.load(corpus_name), key)
+
+    @classmethod
+    def _words_from(cls, data, key=None):
         keys = set(data.keys()) - set(["description"])
         if key is None and len(keys) > 1:
             raise ValueError("I don't know which key to use for this corpus: choose among %s", ",".join(keys))
@@ -200,15 +229,52 @@ class SortWords(Eater):
         l.sort()
         return self.match_capitalization(word, "".join(l))
     
+def words_by_length(word_list):
+    words = defaultdict(list)
+    for i in word_list:
+        words[len(i)].append(i)
+    return words
+
+def words_by_prefix(word_list):
+    words = defaultdict(list)
+    for word in word_list:
+        if len(word) <= 3:
+            continue
+        prefix = word[:3].lower()
+        words[prefix].append(word)
+    return words
+
+def syllables_for_word(words_by_syllable_count):
+    syllables = dict()
+    for count, words in words_by_syllable_count.items():
+        for w in words:
+            syllables[w] = count
+    return syllables
+
+# Indexes derived from the default word lists are built once and saved
+# to disk, rather than being rebuilt every time an eater is created.
+corpora.register_index(
+    "eater_words_by_length", "english_words",
+    lambda data: dict(
+        words_by_length(NeedsWordList._words_from(data, "words")))
+)
+corpora.register_index(
+    "eater_words_by_prefix", "english_words",
+    lambda data: dict(
+        words_by_prefix(NeedsWordList._words_from(data, "words")))
+)
+corpora.register_index(
+    "eater_syllables_for_word", "by_syllable_count",
+    lambda data: syllables_for_word(data["words_by_syllable_count"])
+)
+
 class EatWords(NeedsWordList):
     DESCRIPTION = "Replace a word with another word of the same length."
     KEY = "word"
+    DEFAULT_INDEX = "eater_words_by_length"
 
     def process_word_list(self, word_list):
-        words_by_length = defaultdict(list)
-        for i in word_list:
-            words_by_length[len(i)].append(i)
-        return words_by_length
+        return words_by_length(word_list)
 
     def eat_word(self, word):
         l = len(word)
@@ -222,14 +288,14 @@ class EatWords(NeedsWordList):
 class EatWordEndings(NeedsWordList):
     DESCRIPTION = "Eat word endings"
     KEY = "word-endings"
+    DEFAULT_INDEX = "eater_words_by_prefix"
 
     def process_word_list(self, word_list):
-        self.words_by_prefix = defaultdict(list)
-        for word in word_list:
-            if len(word) <= 3:
-                continue
-            prefix = word[:3].lower()
-            self.words_by_prefix[prefix].append(word)
+        self.words_by_prefix = words_by_prefix(word_list)
+
+    def use_index(self, index):
+        self.words = None
+        self.words_by_prefix = index
 
     def eat_word(self, word):
         if not word:
@@ -241,7 +307,7 @@ class EatWordEndings(NeedsWordList):
         newWord = ''
         prefix = word[:3].lower()
 
-        choices = self.words_by_prefix[prefix]
+        choices = self.words_by_prefix.get(prefix)
         if not choices:
             return word
         return self.match_capitalization(word, random.choice(choices))
@@ -253,10 +319,7 @@ class EatSyllables(NeedsWordList):
 
     def __init__(self):
         self.words_by_syllable_count = corpora.load("by_syllable_count")["words_by_syllable_count"]
-        self.syllables_for_word = dict()
-        for count, words in self.words_by_syllable_count.items():
-            for w in words:
-                self.syllables_for_word[w] = count
+        self.syllables_for_word = corpora.index("eater_syllables_for_word")
 
     def eat_word(self, word):
         count = self.syllables(word)
@@ -3,10 +3,16 @@ import re
 import textwrap
 from textblob import TextBlob, Sentence
 from olipy import corpora
-stopwords = corpora.words.stopwords.en
 
 from olipy.tokenizer import WordTokenizer
 
+def __getattr__(name):
+    # The stopword list used to be loaded at import time. It's now
+    # loaded when it's needed, but it's still available here.
+    if name == "stopwords":
+        return corpora.words.stopwords.en
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
 class EbooksQuotes(object):
 
     def __init__(
@@ -183,6 +189,7 @@ class EbooksQuotes(object):
         # Truncate a string at the last stopword not preceded by
         # another stopword.
         # print "%s =>" % string
+        stopwords = corpora.words.stopwords.en
 
         if isinstance(string, Sentence):
             words = string.words
@@ -185,6 +185,54 @@ def words():
 def eater():
     EaterCommandLine()()
 
+def validate_corpora():
+    """Load and validate corpora in parallel, and report on them."""
+    parser = argparse.ArgumentParser(
+        description="Load and validate corpora, reporting errors and timings.")
+    parser.add_argument(
+        "name", nargs="*", help="Corpora to check. By default, all of them.")
+    parser.add_argument(
+        "--processes", type=int, default=None,
+        help="Number of worker processes. By default, one per CPU.")
+    parser.add_argument(
+        "--slowest", type=int, default=10,
+        help="Show timings for this many of the slowest corpora.")
+    parser.add_argument(
+        "--json", action="store_true",
+        help="Print the full results as JSON.")
+    args = parser.parse_args()
+
+    try:
+        results = corpora.check_corpora(args.name, args.processes)
+    except ValueError as e:
+        parser.error(str(e))
+    errors = sum(len(result["errors"]) for result in results)
+    if args.json:
+        print(json.dumps(results, indent=1))
+        if errors:
+            sys.exit(1)
+        return
+    for result in results:
+        for error in result["errors"]:
+            print("ERROR %s: %s" % (result["path"], error))
+        for warning in result["warnings"]:
+            print("warning %s: %s" % (result["path"], warning))
+    slowest = sorted(
+        results, key=lambda x: x["read_seconds"] + x["decode_seconds"],
+        reverse=True)
+    if slowest and args.slowest:
+        print("")
+        print("%-32s %10s %10s %12s" % ("corpus", "bytes", "ms", "in memory"))
+        for result in slowest[:args.slowest]:
+            print("%-32s %10d %10.1f %12s" % (
+                result["name"], result["bytes_read"],
+                (result["read_seconds"] + result["decode_seconds"]) * 1000,
+                result["size"]))
+    print("")
+    print("%d corpora checked, %d errors." % (len(results), errors))
+    if errors:
+        sys.exit(1)
+
 if __name__ == '__main__':
     func = sys
     module = sys.modules[__name__]
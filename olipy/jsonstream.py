@@ -0,0 +1,185 @@
+"""Iterate over a large JSON document without loading all of it.
+
+A corpus is usually a JSON object with a "description" and one big
+list. iterate() finds that list and yields its items one at a time,
+skipping over everything else without turning it into Python
+objects. Only the current item (and a small read buffer) is ever held
+in memory.
+"""
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+STRUCTURE = re.compile(r'["\[\]{}]')
+
+class _Reader(object):
+    """A buffer over a text file that can be parsed a piece at a time."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size=CHUNK_SIZE):
+        """Read more data, discarding everything before self.pos."""
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Skip whitespace and return the next character, or None at the
+        end of the document.
+        """
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return None
+            self.fill()
+
+    def expect(self, *characters):
+        c = self.peek()
+        if c not in characters:
+            raise ValueError(
+                "Expected %s at offset %d, got %r" % (
+                    " or ".join(characters), self.pos, c)
+            )
+        self.pos += 1
+        return c
+
+    def value(self):
+        """Parse the next value into a Python object."""
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number at the very end of the buffer might continue
+                # in the next chunk.
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read more, reading bigger chunks each time so that a huge
+            # value isn't parsed over and over.
+            self.fill(size)
+            size *= 2
+
+    def skip(self):
+        """Move past the next value without parsing it."""
+        c = self.peek()
+        if c == '"':
+            self.skip_string()
+        elif c in "[{":
+            self.skip_container()
+        else:
+            self.value()
+
+    def skip_string(self):
+        # self.pos is at the opening quote.
+        i = self.pos + 1
+        while True:
+            j = self.buffer.find('"', i)
+            if j == -1:
+                if self.eof:
+                    raise ValueError("Unterminated string")
+                # Discard what's been scanned, except for any trailing
+                # backslashes: they might escape a quote at the start
+                # of the next chunk.
+                self.pos = self._backslashes_before(len(self.buffer))
+                self.fill()
+                i = 0
+                continue
+            start = self._backslashes_before(j)
+            if (j - start) % 2 == 0:
+                self.pos = j + 1
+                return
+            i = j + 1
+
+    def _backslashes_before(self, i):
+        """Find the start of the run of backslashes ending at `i`."""
+        while i > 0 and self.buffer[i-1] == "\\":
+            i -= 1
+        return i
+
+    def skip_container(self):
+        depth = 0
+        while True:
+            match = STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                if self.eof:
+                    raise ValueError("Unterminated array or object")
+                self.pos = len(self.buffer)
+                self.fill()
+                continue
+            c = match.group()
+            self.pos = match.start()
+            if c == '"':
+                self.skip_string()
+                continue
+            self.pos += 1
+            if c in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def items(self):
+        """Iterate over the array or object that starts here.
+
+        Arrays yield their items; objects yield (key, value) 2-tuples.
+        """
+        c = self.expect("[", "{")
+        close = "]" if c == "[" else "}"
+        if self.peek() == close:
+            self.pos += 1
+            return
+        while True:
+            if close == "]":
+                yield self.value()
+            else:
+                key = self.value()
+                self.expect(":")
+                yield key, self.value()
+            if self.expect(",", close) == close:
+                return
+
+    def find(self, key):
+        """Move to the value of `key` in the top-level object."""
+        self.expect("{")
+        if self.peek() == "}":
+            raise KeyError(key)
+        while True:
+            k = self.value()
+            self.expect(":")
+            if k == key:
+                return
+            self.skip()
+            if self.expect(",", "}") == "}":
+                raise KeyError(key)
+
+def iterate(f, key=None):
+    """Iterate over part of a JSON document.
+
+    :param f: A file opened in text mode.
+    :param key: Iterate over the value of this key in the top-level
+        object. If this is None, iterate over the top-level value
+        itself.
+
+    Lists yield their items; objects yield (key, value) 2-tuples.
+    """
+    reader = _Reader(f)
+    if key is not None:
+        reader.find(key)
+    for item in reader.items():
+        yield item
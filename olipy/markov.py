@@ -1,4 +1,58 @@
-from random import choice
+from array import array
+from bisect import bisect_right
+from collections import Counter, deque
+from itertools import accumulate, chain, islice, repeat
+import json
+import mmap
+import operator
+import os
+from random import Random, choice, randrange
+import struct
+import sys
+import time
+from olipy.compiled import StringTable
+
+class TrainingStats(object):
+    """Keeps track of how much text a Markov model has been trained on,
+    and how fast.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.tokens = 0
+        self.seconds = 0.0
+
+    @property
+    def tokens_per_second(self):
+        if not self.seconds:
+            return 0.0
+        return self.tokens / self.seconds
+
+    def __repr__(self):
+        return "<TrainingStats: %d lines, %d tokens in %.2fs (%d tokens/sec)>" % (
+            self.lines, self.tokens, self.seconds, self.tokens_per_second)
+
+def lines_in(chunks):
+    """Split a stream of text into lines.
+
+    :param chunks: An iterable of strings, such as the result of
+        calling read() on a file over and over. A line may be split
+        across any number of chunks.
+    """
+    pieces = []
+    for chunk in chunks:
+        lines = chunk.split("\n")
+        if len(lines) == 1:
+            pieces.append(chunk)
+            continue
+        pieces.append(lines[0])
+        yield "".join(pieces)
+        for line in lines[1:-1]:
+            yield line
+        pieces = [lines[-1]]
+    rest = "".join(pieces)
+    if rest:
+        yield rest
 
 class MarkovGenerator(object):
 
@@ -19,29 +73,63 @@ class MarkovGenerator(object):
     @classmethod
     def load(cls, f, order=1, max=500):
         """Load from a filehandle that defines a single chunk of text."""
-        corpus = MarkovGenerator(order, max)
+        corpus = cls(order, max)
         corpus.add(f.read())
         return corpus
 
     @classmethod
     def loadlines(cls, f, order=1, max=500):
         """Load from a filehandle that defines one text per line."""
-        corpus = MarkovGenerator(order, max)
+        corpus = cls(order, max)
         if not hasattr(f, 'read'):
             # Not a file-type object. Treat it as a multi-line string.
             f = f.split("\n")
-        for l in f:
-            corpus.add(l.strip())
+        corpus.train(f)
         return corpus
 
+    def train(self, lines, stats=None, progress=None, every=100000):
+        """Train on a stream of texts, one per line.
+
+        Lines are read one at a time, so this works on corpora much
+        bigger than memory, as long as the model itself fits. Calling
+        train() again continues training the same model.
+
+        :param lines: An iterable of strings, such as an open file. To
+            train on arbitrary chunks of text, pass in lines_in(chunks).
+        :param stats: A TrainingStats to add to, to keep running totals
+            over several calls. By default, a new one is created.
+        :param progress: A function to call with the TrainingStats
+            after every `every` lines.
+        :return: The TrainingStats.
+        """
+        if stats is None:
+            stats = TrainingStats()
+        add = self.add
+        started = time.perf_counter() - stats.seconds
+        for line in lines:
+            # Subclasses written before add() returned anything will
+            # return None.
+            stats.tokens += add(line.strip()) or 0
+            stats.lines += 1
+            if progress is not None and stats.lines % every == 0:
+                stats.seconds = time.perf_counter() - started
+                progress(stats)
+        stats.seconds = time.perf_counter() - started
+        return stats
+
     def tokenize(self, text):
         return text.split(" ")
 
     def add(self, text):
+        """Train on a single text.
+
+        :return: The number of tokens learned from, which is 0 if the
+            text was too short to use.
+        """
         tokens = self.tokenize(text)
         # discard this line if it's too short
         if len(tokens) < self.order:
-            return
+            return 0
 
         # store the first ngram of this line
         beginning = tuple(tokens[:self.order])
@@ -61,6 +149,7 @@ class MarkovGenerator(object):
             # Store the fact that a given token was the last one on the line.
             final_gram = tuple(tokens[i+1:i+self.order+1])
             self.ngrams.setdefault(final_gram, []).append(None)
+        return len(tokens)
 
     # called from generate() to join together generated elements
     def concatenate(self, source):
@@ -95,6 +184,63 @@ class MarkovGenerator(object):
     generate = assemble
     chain = assemble
 
+    def generate_many(self, n, max_len=None, seed=None):
+        """Generate many texts at once.
+
+        This is faster than calling assemble() over and over.
+
+        :param n: The number of texts to generate.
+        :param max_len: The maximum number of tokens to add after the
+            first ngram of each text. By default, this is self.max.
+        :param seed: A seed for the random number generator, to get
+            the same texts every time.
+        :return: A list of strings, each joined with concatenate().
+        """
+        if max_len is None:
+            max_len = self.max
+        # Random.choice() is much slower than indexing with random().
+        random = Random(seed).random
+        modify, start = self._hooks()
+        ngrams = self.ngrams
+        beginnings = self.beginnings
+        order = self.order
+        concatenate = self.concatenate
+        texts = []
+        for i in range(n):
+            if start:
+                start()
+            current = beginnings[int(random() * len(beginnings))]
+            output = list(current)
+            words = list(current) if modify else output
+            for j in range(max_len):
+                possible_next = ngrams.get(current)
+                if possible_next is None:
+                    break
+                next = possible_next[int(random() * len(possible_next))]
+                if next is None:
+                    break
+                output.append(next)
+                if modify:
+                    words.append(modify(next))
+                current = tuple(output[-order:])
+            texts.append(concatenate(words))
+        return texts
+
+    def _hooks(self):
+        # Get start() and modify(), or None for either one if it
+        # doesn't do anything and needn't be called.
+        cls = type(self)
+        modify = start = None
+        if cls.modify is not MarkovGenerator.modify:
+            modify = self.modify
+        if cls.start is not MarkovGenerator.start:
+            start = self.start
+        return modify, start
+
+    def start(self):
+        """Called before each text is generated."""
+        pass
+
     def modify(self, token):
         """Modify a token before yielding it."""
         return token
@@ -119,10 +265,13 @@ class BracketMatchingMarkovGenerator(MarkovGenerator):
         return tokens
 
     def assemble(self):
-        self.stack = []
+        self.start()
         for x in super(BracketMatchingMarkovGenerator, self).assemble():
             yield x
 
+    def start(self):
+        self.stack = []
+
     def modify(self, token_to_yield):
         # Is there an opening bracket in this token?
         for opening, closing in ['""', "()", "[]", "{}"]:
@@ -154,7 +303,668 @@ class BracketMatchingMarkovGenerator(MarkovGenerator):
                 return check_for
         # No luck. Return the original token.
         return token_to_yield
-  
+
+class CompactMarkovGenerator(MarkovGenerator):
+
+    """A MarkovGenerator that keeps its model in arrays of integers.
+
+    Every distinct token is given an integer ID, with 0 standing for
+    the end of a line. Every distinct ngram (a "state") is given an
+    index. For each state, the model stores the tokens that followed
+    it, how many times each one did, and which state that leads to.
+    A token that shows up a thousand times after a given ngram takes
+    up one entry, not a thousand, and the generator samples from the
+    counts instead of from a list of duplicates.
+
+    This takes much less memory than a MarkovGenerator trained on the
+    same text, and generates texts with the same probabilities. The
+    `ngrams` and `beginnings` attributes of MarkovGenerator aren't
+    used.
+    """
+
+    # The ID that marks the end of a line.
+    END = 0
+
+    # The target of a transition that leads to a state with no
+    # successors, which ends the text.
+    NO_STATE = 0xFFFFFFFF
+
+    # Transitions are collected in a buffer, then merged into the
+    # model's arrays once the buffer is at least this big (or as big
+    # as the model itself), or the model is used.
+    MERGE_THRESHOLD = 1000000
+
+    def __init__(self, order=1, max=500):
+        self.order = order # order (length) of ngrams
+        self.max = max # maximum number of elements to generate
+
+        # Token IDs. The end of a line has ID 0.
+        self.vocabulary = [None]
+        self.ids = dict()
+
+        # The token IDs in each state, `order` at a time, and the
+        # index of each state, keyed by its packed token IDs (see
+        # pack()).
+        self.state_tokens = array("I")
+        self.state_index = dict()
+
+        # The successors of state `i` are at positions starts[i]
+        # through starts[i+1] of tokens, counts and targets, sorted by
+        # token ID.
+        self.starts = array("I", [0])
+        self.tokens = array("I")
+        self.counts = array("I")
+
+        # The beginning ngram of every line, `order` token IDs at a
+        # time, and how many lines began with it.
+        self.beginning_tokens = array("I")
+        self.beginning_counts = array("I")
+        self.beginning_index = dict()
+
+        # Transitions that haven't been merged into the arrays yet:
+        # the state, and the ID of the token that followed it.
+        self.pending_states = array("I")
+        self.pending_tokens = array("I")
+
+        # Counts from other models that haven't been merged into the
+        # arrays yet, keyed the same way as in _merge_runs().
+        self.pending_counts = Counter()
+
+        # Derived tables used for sampling; see tables() and
+        # alias_tables().
+        self._tables = None
+        self._alias_tables = None
+
+    @classmethod
+    def pack(cls, ids):
+        """Combine a sequence of token IDs into a single integer."""
+        key = 0
+        for i in ids:
+            key = (key << 32) | i
+        return key
+
+    def _pack_all(self, ids):
+        """Pack a flat sequence of token IDs, `order` at a time, into
+        an iterator of integers.
+        """
+        order = self.order
+        keys = ids[0::order]
+        for i in range(1, order):
+            keys = map(operator.or_, map(operator.lshift, keys, repeat(32)),
+                       ids[i::order])
+        return keys
+
+    def _id(self, token):
+        i = self.ids.get(token)
+        if i is None:
+            i = len(self.vocabulary)
+            self.vocabulary.append(token)
+            self.ids[token] = i
+        return i
+
+    def _state(self, key, ids):
+        state = self.state_index.get(key)
+        if state is None:
+            state = len(self.state_index)
+            self.state_index[key] = state
+            self.state_tokens.extend(ids)
+        return state
+
+    def add(self, text):
+        tokens = self.tokenize(text)
+        order = self.order
+        # discard this line if it's too short
+        if len(tokens) < order:
+            return 0
+        if self.ids is None:
+            self._make_trainable()
+        # No token has the ID 0, so `or` is only used for new tokens.
+        get_id = self.ids.get
+        ids = [get_id(token) or self._id(token) for token in tokens]
+        self._tables = None
+
+        # count the first ngram of this line
+        key = self.pack(ids[:order])
+        beginning = self.beginning_index.get(key)
+        if beginning is None:
+            beginning = len(self.beginning_counts)
+            self.beginning_index[key] = beginning
+            self.beginning_tokens.extend(ids[:order])
+            self.beginning_counts.append(0)
+        self.beginning_counts[beginning] += 1
+
+        # Slide a window of `order` tokens along the line, keeping
+        # the packed IDs in the window up to date.
+        mask = (1 << (32 * order)) - 1
+        key = self.pack(ids[:order-1])
+        n = len(ids) - order
+        get_state = self.state_index.get
+        states = []
+        for i in range(n):
+            key = ((key << 32) | ids[i+order-1]) & mask
+            state = get_state(key)
+            if state is None:
+                state = self._state(key, ids[i:i+order])
+            states.append(state)
+        self.pending_states.extend(states)
+        self.pending_tokens.extend(ids[order:])
+
+        if n > 1:
+            # Store the fact that a given token was the last one on
+            # the line. (Like MarkovGenerator, this is only done for
+            # lines with at least two tokens after the first ngram.)
+            key = ((key << 32) | ids[-1]) & mask
+            self.pending_states.append(self._state(key, ids[n:]))
+            self.pending_tokens.append(self.END)
+
+        if len(self.pending_tokens) >= max(
+                self.MERGE_THRESHOLD, len(self.tokens)):
+            self.merge()
+        return len(tokens)
+
+    def merge(self):
+        """Merge pending transitions into the model's arrays."""
+        if not self.pending_tokens and not self.pending_counts:
+            return
+        # Sort the new transitions by state and then token, and count
+        # how many times each one happened.
+        runs = self.pending_counts
+        runs.update(map(
+            operator.or_, map(operator.lshift, self.pending_states,
+                              repeat(32)),
+            self.pending_tokens
+        ))
+        self.pending_states = array("I")
+        self.pending_tokens = array("I")
+        self.pending_counts = Counter()
+        self._merge_runs(sorted(runs.items()))
+
+    def _merge_runs(self, runs):
+        """Add counts to the model's arrays.
+
+        :param runs: A sorted list of (key, count) 2-tuples, where the
+            key is a state index shifted left 32 bits, plus a token ID.
+        """
+        starts = array("I", [0])
+        tokens = array("I")
+        counts = array("I")
+        old_states = len(self.starts) - 1
+        j = 0
+        for state in range(len(self.state_index)):
+            lo = hi = 0
+            if state < old_states:
+                lo = self.starts[state]
+                hi = self.starts[state+1]
+            base = state << 32
+            while j < len(runs) and runs[j][0] >> 32 == state:
+                key, count = runs[j]
+                token = key - base
+                j += 1
+                # Copy over existing transitions that come before this
+                # one, and add in the existing count for this one.
+                while lo < hi and self.tokens[lo] < token:
+                    tokens.append(self.tokens[lo])
+                    counts.append(self.counts[lo])
+                    lo += 1
+                if lo < hi and self.tokens[lo] == token:
+                    count += self.counts[lo]
+                    lo += 1
+                tokens.append(token)
+                counts.append(count)
+            tokens.extend(self.tokens[lo:hi])
+            counts.extend(self.counts[lo:hi])
+            starts.append(len(tokens))
+        self.starts = starts
+        self.tokens = tokens
+        self.counts = counts
+        self._tables = None
+
+    def update(self, other):
+        """Add everything another CompactMarkovGenerator has learned to
+        this one, as though this one had been trained on its text too.
+
+        This makes it possible to train on pieces of a corpus
+        separately and combine the results. If the pieces are
+        combined in order, the result is exactly the model that
+        training on the whole corpus would have produced.
+        """
+        if other.order != self.order:
+            raise ValueError(
+                "Can't combine a model of order %d with one of order %d" % (
+                    other.order, self.order))
+        if self.ids is None:
+            self._make_trainable()
+        other.merge()
+        order = self.order
+
+        # Find this model's ID for each of the other model's tokens,
+        # and its index for each of the other model's states.
+        ids = array("I", [self.END])
+        ids.extend(self._id(token) for token in other.vocabulary[1:])
+        mapped = array("I", map(ids.__getitem__, other.state_tokens))
+        get_state = self.state_index.get
+        states = array("I")
+        for i, key in enumerate(self._pack_all(mapped)):
+            state = get_state(key)
+            if state is None:
+                state = self._state(key, mapped[i*order:(i+1)*order])
+            states.append(state)
+
+        # Like add(), hold on to the counts until there are enough of
+        # them to be worth merging into the arrays.
+        runs = self.pending_counts
+        starts = other.starts
+        bases = map(operator.lshift, states, repeat(32))
+        lengths = map(operator.sub, starts[1:], starts[:-1])
+        keys = map(
+            operator.or_,
+            chain.from_iterable(map(repeat, bases, lengths)),
+            map(ids.__getitem__, other.tokens)
+        )
+        # Each key shows up once per model, so this can be added in
+        # one go.
+        runs.update(dict(zip(keys, other.counts)))
+
+        mapped = array("I", map(ids.__getitem__, other.beginning_tokens))
+        for i, key in enumerate(self._pack_all(mapped)):
+            beginning = self.beginning_index.get(key)
+            if beginning is None:
+                beginning = len(self.beginning_counts)
+                self.beginning_index[key] = beginning
+                self.beginning_tokens.extend(mapped[i*order:(i+1)*order])
+                self.beginning_counts.append(0)
+            self.beginning_counts[beginning] += other.beginning_counts[i]
+
+        if hasattr(self, "useful_tokens") and hasattr(other, "useful_tokens"):
+            self.useful_tokens.update(other.useful_tokens)
+        self._tables = None
+        if len(runs) >= max(self.MERGE_THRESHOLD, len(self.tokens)):
+            self.merge()
+
+    @classmethod
+    def train_sharded(cls, lines, order=1, max=500, processes=None,
+                      shard_size=50000, stats=None):
+        """Train a new model on a stream of texts, one per line, using a
+        pool of worker processes.
+
+        The lines are split into shards of `shard_size` lines, each
+        shard is trained in a worker, and the workers' models are
+        combined with update(), two at a time, also in the workers.
+        Neighbouring models are always combined in order, so the
+        result is the same as calling train() on a single model.
+
+        :param lines: An iterable of strings, such as an open file.
+            Only a few shards per worker are read ahead.
+        :param processes: The number of worker processes. By default,
+            one per CPU. If this is 1, everything happens in this
+            process.
+        :param stats: A TrainingStats to add to. Its time is the time
+            it took to train the whole model, not the total time
+            spent by the workers.
+        :return: The trained model.
+        """
+        model = cls(order, max)
+        if stats is None:
+            stats = TrainingStats()
+        if processes == 1:
+            model.train(lines, stats)
+            return model
+        started = time.perf_counter() - stats.seconds
+        lines = iter(lines)
+        workers = processes or os.cpu_count() or 1
+        pending = deque()
+        # Combining every shard's model in this process would make it
+        # the bottleneck, so models covering the same number of shards
+        # are combined in pairs by the workers, like carrying in binary
+        # addition. Each entry is the number of shards a model covers,
+        # and a future for the model, in the order of the text.
+        combined = []
+        # Importing these is slow, so wait until they're needed.
+        from concurrent.futures import Future, ProcessPoolExecutor
+        with ProcessPoolExecutor(processes) as pool:
+            while True:
+                shard = list(islice(lines, shard_size))
+                if shard:
+                    pending.append(
+                        pool.submit(_train_shard, cls, order, shard))
+                if pending and (not shard or len(pending) > workers * 2):
+                    shard_model, shard_stats = pending.popleft().result()
+                    stats.lines += shard_stats.lines
+                    stats.tokens += shard_stats.tokens
+                    future = Future()
+                    future.set_result(shard_model)
+                    size = 1
+                    while combined and combined[-1][0] == size:
+                        earlier = combined.pop()[1]
+                        future = pool.submit(
+                            _combine_shards, earlier.result(),
+                            future.result())
+                        size *= 2
+                    combined.append((size, future))
+                elif not shard:
+                    break
+            # At most one model of each size is left, biggest first.
+            if combined:
+                model = combined[0][1].result()
+                model.max = max
+                for _, future in combined[1:]:
+                    model.update(future.result())
+        if model.ids is None:
+            model._make_trainable()
+        model.merge()
+        stats.seconds = time.perf_counter() - started
+        return model
+
+    def tables(self):
+        """Get the tables used for sampling.
+
+        :return: A 5-tuple (cumulative, targets, beginning_cumulative,
+            beginning_states, vocabulary). `cumulative` holds a
+            running total of the counts of each state's successors;
+            `targets` holds the state each successor leads to. The
+            beginning_* arrays do the same for the beginnings of lines.
+        """
+        if self._tables is None:
+            self.merge()
+            mask = (1 << (32 * self.order)) - 1
+            get = self.state_index.get
+            cumulative = array("I")
+            targets = array("I")
+            for state in range(len(self.starts) - 1):
+                lo = self.starts[state]
+                hi = self.starts[state+1]
+                cumulative.extend(accumulate(self.counts[lo:hi]))
+                # The state a token leads to is made of the last
+                # order-1 tokens of this state, plus that token.
+                key = (self.pack(self._state_ids(state)) << 32) & mask
+                targets.extend(map(
+                    get, map(operator.or_, repeat(key),
+                             self.tokens[lo:hi]),
+                    repeat(self.NO_STATE)
+                ))
+            order = self.order
+            beginning_cumulative = array(
+                "I", accumulate(self.beginning_counts))
+            beginning_states = array("I", [
+                get(self.pack(self.beginning_tokens[i:i+order]),
+                    self.NO_STATE)
+                for i in range(0, len(self.beginning_tokens), order)
+            ])
+            self._tables = (
+                cumulative, targets, beginning_cumulative,
+                beginning_states, self.vocabulary
+            )
+        return self._tables
+
+    def alias_tables(self):
+        """Get the tables used by generate_many(), which choose a
+        successor for any state in constant time. (See
+        olipy.randomness.alias_table.)
+
+        :return: A 4-tuple (probabilities, aliases,
+            beginning_probabilities, beginning_aliases).
+            `probabilities` and `aliases` line up with `tokens`, and
+            each alias is a position in `tokens`.
+        """
+        # olipy.randomness imports NumPy if it's available, which
+        # isn't needed until now.
+        from olipy.randomness import alias_table
+        tables = self.tables()
+        if self._alias_tables is None or self._alias_tables[0] is not tables:
+            starts = self.starts
+            counts = self.counts
+            probabilities = array("d")
+            aliases = array("I")
+            for state in range(len(starts) - 1):
+                lo = starts[state]
+                hi = starts[state+1]
+                if hi - lo == 1:
+                    probabilities.append(1.0)
+                    aliases.append(lo)
+                    continue
+                state_probabilities, state_aliases = alias_table(
+                    counts[lo:hi])
+                probabilities.extend(state_probabilities)
+                aliases.extend(map(operator.add, state_aliases, repeat(lo)))
+            beginning_probabilities = array("d")
+            beginning_aliases = array("I")
+            if len(self.beginning_counts):
+                table = alias_table(self.beginning_counts)
+                beginning_probabilities.extend(table[0])
+                beginning_aliases.extend(table[1])
+            self._alias_tables = (tables, (
+                probabilities, aliases, beginning_probabilities,
+                beginning_aliases
+            ))
+        return self._alias_tables[1]
+
+    def _state_ids(self, state):
+        return self.state_tokens[state*self.order:(state+1)*self.order]
+
+    def assemble(self):
+        "Yield a new text similar to existing texts."
+        (cumulative, targets, beginning_cumulative, beginning_states,
+         vocabulary) = self.tables()
+        if not beginning_cumulative:
+            raise IndexError("Cannot choose from an empty model")
+
+        # get a random line beginning, weighted by how often each one
+        # was seen.
+        beginning = bisect_right(
+            beginning_cumulative, randrange(beginning_cumulative[-1]))
+        order = self.order
+        for i in self.beginning_tokens[beginning*order:(beginning+1)*order]:
+            yield vocabulary[i]
+
+        state = beginning_states[beginning]
+        starts = self.starts
+        tokens = self.tokens
+        for i in range(self.max):
+            if state == self.NO_STATE:
+                break
+            lo = starts[state]
+            hi = starts[state+1]
+            position = bisect_right(
+                cumulative, randrange(cumulative[hi-1]), lo, hi)
+            token = tokens[position]
+            if token == self.END:
+                # This is the final item!
+                break
+            yield self.modify(vocabulary[token])
+            state = targets[position]
+
+    generate = assemble
+    chain = assemble
+
+    def generate_many(self, n, max_len=None, seed=None):
+        (cumulative, targets, beginning_cumulative, beginning_states,
+         vocabulary) = self.tables()
+        if not beginning_cumulative:
+            raise IndexError("Cannot choose from an empty model")
+        (probabilities, aliases, beginning_probabilities,
+         beginning_aliases) = self.alias_tables()
+        if max_len is None:
+            max_len = self.max
+        random = Random(seed).random
+        modify, start = self._hooks()
+        order = self.order
+        beginning_tokens = self.beginning_tokens
+        beginnings = len(beginning_probabilities)
+        starts = self.starts
+        tokens = self.tokens
+        END = self.END
+        NO_STATE = self.NO_STATE
+        concatenate = self.concatenate
+        texts = []
+        for i in range(n):
+            if start:
+                start()
+            # Pick a slot at random, and use the fractional part of
+            # the same random number to decide whether to take its
+            # alias instead.
+            x = random() * beginnings
+            beginning = int(x)
+            if x - beginning >= beginning_probabilities[beginning]:
+                beginning = beginning_aliases[beginning]
+            words = [vocabulary[token] for token in
+                     beginning_tokens[beginning*order:(beginning+1)*order]]
+            state = beginning_states[beginning]
+            for j in range(max_len):
+                if state == NO_STATE:
+                    break
+                lo = starts[state]
+                x = random() * (starts[state+1] - lo)
+                slot = int(x)
+                position = lo + slot
+                if x - slot >= probabilities[position]:
+                    position = aliases[position]
+                token = tokens[position]
+                if token == END:
+                    break
+                if modify:
+                    words.append(modify(vocabulary[token]))
+                else:
+                    words.append(vocabulary[token])
+                state = targets[position]
+            texts.append(concatenate(words))
+        return texts
+
+    # The saved model format. After the preamble comes a JSON header,
+    # padded to a multiple of four bytes, then each array in ARRAYS,
+    # then the vocabulary as a StringTable.
+    MAGIC = b"OLIPYMKV"
+    VERSION = 1
+
+    # Magic number, version, header length.
+    PREAMBLE = struct.Struct("<8sII")
+
+    ARRAYS = [
+        "state_tokens", "starts", "tokens", "counts", "cumulative",
+        "targets", "beginning_tokens", "beginning_counts",
+        "beginning_cumulative", "beginning_states",
+    ]
+
+    def save(self, path):
+        """Write the model to a file that open() can memory-map."""
+        (cumulative, targets, beginning_cumulative, beginning_states,
+         vocabulary) = self.tables()
+        arrays = dict(
+            cumulative=cumulative, targets=targets,
+            beginning_cumulative=beginning_cumulative,
+            beginning_states=beginning_states,
+        )
+        blobs = []
+        for name in self.ARRAYS:
+            value = arrays.get(name)
+            if value is None:
+                value = getattr(self, name)
+            blobs.append(array("I", value).tobytes())
+        # The end-of-line marker has no string of its own.
+        blobs.append(StringTable.encode([""] + list(vocabulary[1:])))
+        header = dict(
+            byteorder=sys.byteorder, order=self.order, max=self.max,
+            lengths=[len(blob) for blob in blobs[:-1]],
+            vocabulary=len(vocabulary),
+        )
+        if hasattr(self, "useful_tokens"):
+            header["useful_tokens"] = sorted(self.useful_tokens)
+        header_bytes = json.dumps(header).encode("utf8")
+        header_bytes += b" " * (-len(header_bytes) % 4)
+        with open(path, "wb") as f:
+            f.write(self.PREAMBLE.pack(
+                self.MAGIC, self.VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for blob in blobs:
+                f.write(blob)
+
+    @classmethod
+    def open(cls, path):
+        """Memory-map a model written by save().
+
+        The model can generate text right away, without building any
+        Python objects for its tables. Every process that opens the
+        same file shares its memory. Training the model further is
+        possible, but makes an in-memory copy of everything first.
+        """
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = cls.PREAMBLE.unpack_from(buffer)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(
+                "%s is not a saved Markov model (version %d)" % (
+                    path, cls.VERSION))
+        start = cls.PREAMBLE.size
+        header = json.loads(bytes(buffer[start:start+header_length]))
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(
+                "%s was saved on a machine with a different byte order"
+                % path)
+        model = cls(header["order"], header["max"])
+        view = memoryview(buffer)
+        position = start + header_length
+        arrays = dict()
+        for name, length in zip(cls.ARRAYS, header["lengths"]):
+            arrays[name] = view[position:position+length].cast("I")
+            position += length
+        vocabulary = StringTable(buffer, position, header["vocabulary"])
+        for name in ("state_tokens", "starts", "tokens", "counts",
+                     "beginning_tokens", "beginning_counts"):
+            setattr(model, name, arrays[name])
+        model.vocabulary = vocabulary
+        model._tables = (
+            arrays["cumulative"], arrays["targets"],
+            arrays["beginning_cumulative"], arrays["beginning_states"],
+            vocabulary
+        )
+        # These are rebuilt if the model is trained further.
+        model.ids = model.state_index = model.beginning_index = None
+        if "useful_tokens" in header and hasattr(model, "useful_tokens"):
+            model.useful_tokens = set(header["useful_tokens"])
+        return model
+
+    def _make_trainable(self):
+        """Copy an opened model into memory so that it can be trained."""
+        self.vocabulary = [None] + list(self.vocabulary[1:])
+        self.ids = dict(
+            (token, i) for i, token in enumerate(self.vocabulary) if i
+        )
+        for name in ("state_tokens", "starts", "tokens", "counts",
+                     "beginning_tokens", "beginning_counts"):
+            setattr(self, name, array("I", getattr(self, name)))
+        self.state_index = dict(
+            (key, i) for i, key in enumerate(self._pack_all(self.state_tokens))
+        )
+        self.beginning_index = dict(
+            (key, i)
+            for i, key in enumerate(self._pack_all(self.beginning_tokens))
+        )
+        self._tables = None
+
+def _train_shard(cls, order, lines):
+    """Train a model on one shard of a corpus, in a worker process."""
+    model = cls(order)
+    stats = model.train(lines)
+    model.merge()
+    # update() only needs the arrays and vocabulary, so don't send the
+    # dictionaries back to the parent process.
+    model.ids = model.state_index = model.beginning_index = None
+    return model, stats
+
+def _combine_shards(model, other):
+    """Add a model to the model for the text just before it, in a
+    worker process.
+    """
+    model.update(other)
+    model.merge()
+    model.ids = model.state_index = model.beginning_index = None
+    return model
+
+class CompactBracketMatchingMarkovGenerator(
+        BracketMatchingMarkovGenerator, CompactMarkovGenerator):
+    """A CompactMarkovGenerator that tries to ensure balanced brackets
+    and double quotes.
+    """
+
 if __name__ == '__main__':
     import sys
     generator = MarkovGenerator.loadlines(sys.stdin, order=1, max=500)
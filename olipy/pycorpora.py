@@ -1,3 +1,9 @@
 # Import everything from corpora into a different file for exact
 # compatibility with pycorpora.
-from corpora import *
+from olipy.corpora import *
+from olipy import corpora as _corpora
+
+def __getattr__(name):
+    # Categories are created on demand, so they aren't picked up by
+    # the import above.
+    return getattr(_corpora, name)
@@ -1,4 +1,5 @@
 """Create Queneau assemblies of source texts."""
+from collections.abc import Mapping
 from io import StringIO
 import json
 import random
@@ -20,7 +21,7 @@ class Assembler(object):
         return self.tokens_by_position
 
     def add(self, item, tokens_in='tokens'):
-        if isinstance(item, dict):
+        if isinstance(item, Mapping):
             if not tokens_in in item:
                 raise ValueError(
                     "Dictionary added to corpus must put tokens in '%s'." % tokens_in)
@@ -193,7 +194,7 @@ class Assembler(object):
     def dump(self, f, compress=False):
         for item in self.items:
             if compress:
-                if isinstance(item, dict):
+                if isinstance(item, Mapping):
                     tokens = item['tokens']
                 else:
                     tokens = item
@@ -1,6 +1,27 @@
 """Sophisticated tools for random choices."""
+import itertools
 import random
 
+# Sampler uses NumPy if it's installed. Importing NumPy is slow, so
+# that's put off until the first Sampler is created.
+numpy = None
+_looked_for_numpy = False
+
+def _import_numpy():
+    """Import NumPy, if it's installed.
+
+    :return: The numpy module, or None.
+    """
+    global numpy, _looked_for_numpy
+    if not _looked_for_numpy:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+        _looked_for_numpy = True
+    return numpy
+
 COMMON = "common"                 # 65%
 UNCOMMON = "uncommon"             # 20%
 RARE = "rare"                     # 11%
@@ -74,3 +95,116 @@ class Gradient(object):
             yield x
         for x in cls.gradient(go_to, go_from, l2):
             yield x
+
+def alias_table(weights):
+    """Build a table for choosing from a weighted list in constant time.
+
+    This is Vose's version of the alias method. To make a choice, pick
+    a slot `i` at random, and then pick `i` with probability
+    `probabilities[i]`, or `aliases[i]` otherwise.
+
+    :param weights: A list of nonnegative numbers, not all zero.
+    :return: A 2-tuple (probabilities, aliases).
+    """
+    n = len(weights)
+    total = float(sum(weights))
+    if n == 0 or total <= 0:
+        raise ValueError("Weights must include at least one positive number.")
+    if min(weights) < 0:
+        raise ValueError("Weights can't be negative.")
+    scaled = [w * n / total for w in weights]
+    probabilities = [1.0] * n
+    aliases = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1]
+    large = [i for i, p in enumerate(scaled) if p >= 1]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        probabilities[s] = scaled[s]
+        aliases[s] = l
+        scaled[l] -= 1 - scaled[s]
+        if scaled[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+    # Whatever's left over has a probability of 1, give or take
+    # rounding error.
+    return probabilities, aliases
+
+class Sampler(object):
+    """Makes many random choices from a list at once.
+
+    If NumPy is installed, choices are made in bulk with NumPy's
+    random number generator, using an alias table if the choices are
+    weighted. Otherwise, random.choices() is used.
+    """
+
+    def __init__(self, items, weights=None, seed=None):
+        """Constructor.
+
+        :param items: A list of things to choose from, such as a list
+            of words from a corpus.
+        :param weights: An optional list of relative weights, one per
+            item, such as word frequencies.
+        :param seed: Seed the random number generator with this value,
+            to get the same choices every time.
+        """
+        if weights is not None and len(weights) != len(items):
+            raise ValueError(
+                "Got %d items but %d weights" % (len(items), len(weights)))
+        if not len(items):
+            raise ValueError("Can't sample from an empty list.")
+        if weights is not None and len(weights) and min(weights) < 0:
+            raise ValueError("Weights can't be negative.")
+        self.items = items
+        self.weights = weights
+        numpy = self.numpy = _import_numpy()
+        if numpy:
+            self.random = numpy.random.default_rng(seed)
+            self.array = numpy.fromiter(items, dtype=object, count=len(items))
+            if weights is not None:
+                probabilities, aliases = alias_table(list(weights))
+                self.probabilities = numpy.array(probabilities)
+                self.aliases = numpy.array(aliases)
+        else:
+            self.random = random.Random(seed)
+            if weights is not None:
+                self.cumulative = list(itertools.accumulate(weights))
+
+    def indexes(self, n):
+        """Choose `n` positions in the list, with replacement.
+
+        :return: A list of integers.
+        """
+        if not self.numpy:
+            positions = range(len(self.items))
+            if self.weights is None:
+                return self.random.choices(positions, k=n)
+            return self.random.choices(
+                positions, cum_weights=self.cumulative, k=n)
+        return self._chosen(n).tolist()
+
+    def _chosen(self, n):
+        # Choose `n` positions as a NumPy array.
+        chosen = self.random.integers(0, len(self.items), size=n)
+        if self.weights is not None:
+            keep = self.random.random(n) < self.probabilities[chosen]
+            chosen = self.numpy.where(
+                keep, chosen, self.aliases[chosen])
+        return chosen
+
+    def sample(self, n):
+        """Choose `n` items from the list, with replacement.
+
+        :return: A list.
+        """
+        if not self.numpy:
+            if self.weights is None:
+                return self.random.choices(self.items, k=n)
+            return self.random.choices(
+                self.items, cum_weights=self.cumulative, k=n)
+        return self.array[self._chosen(n)].tolist()
+
+    def choice(self):
+        """Choose one item from the list."""
+        return self.sample(1)[0]
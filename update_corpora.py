@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+"""Bring olipy/data/corpora-original up to date with Darius Kazemi's
+corpora project.
+
+Given a local checkout of https://github.com/dariusk/corpora (or, by
+default, a fresh clone), this copies over only the JSON files that
+have changed, removes the ones that are gone, and then updates the
+manifest, compiled files and derived indexes for just those files.
+Every new or changed file is validated first; if any of them can't be
+parsed, nothing is copied.
+
+Currently this is the most reliable way to make sure olipy ships
+with _some_ version of corpora, even though it probably won't be the
+latest version by the time olipy is installed.
+
+For history, see:
+https://github.com/aparrish/pycorpora/issues/8#issuecomment-386848837
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from olipy import corpora
+# Register the eaters' derived indexes so they can be rebuilt.
+import olipy.eater
+
+CORPORA_REPO = "https://github.com/dariusk/corpora"
+DESTINATION = os.path.join(corpora.data_path, "corpora-original", "data")
+
+def sha1(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def json_files(directory):
+    """Find every JSON file beneath `directory`, relative to it."""
+    found = set()
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for filename in filenames:
+            if filename.endswith(".json"):
+                found.add(corpora._relative(
+                    os.path.join(dirpath, filename), directory))
+    return found
+
+def bundled_hashes(manifest):
+    """Find the SHA-1 hash of every bundled file, relative to
+    DESTINATION, using the manifest where possible.
+    """
+    root = corpora._relative(DESTINATION, corpora.data_path)
+    entries = {}
+    if manifest:
+        entries = manifest["directories"].get(root, {}).get("files", {})
+    hashes = {}
+    for name in json_files(DESTINATION):
+        entry = entries.get(name)
+        if entry and "sha1" in entry:
+            hashes[name] = entry["sha1"]
+        else:
+            hashes[name] = sha1(os.path.join(DESTINATION, *name.split("/")))
+    return hashes
+
+def diff(source):
+    """Compare a checkout's data directory to the bundled one.
+
+    :return: A 2-tuple (changed, removed) of sets of paths relative
+        to the data directory. `changed` includes new files.
+    """
+    manifest = None
+    if os.path.exists(corpora.manifest_path):
+        with open(corpora.manifest_path) as f:
+            manifest = json.load(f)
+    bundled = bundled_hashes(manifest)
+    available = json_files(source)
+    changed = set(
+        name for name in available
+        if bundled.get(name) != sha1(os.path.join(source, *name.split("/")))
+    )
+    removed = set(bundled) - available
+    return changed, removed
+
+def validate(source, names):
+    """Validate files, printing any problems.
+
+    :return: True if none of the files have errors.
+    """
+    ok = True
+    for name in sorted(names):
+        errors, warnings = corpora.validate_corpus(
+            os.path.join(source, *name.split("/")))
+        for problem in errors:
+            print("ERROR %s: %s" % (name, problem))
+            ok = False
+        for problem in warnings:
+            print("warning %s: %s" % (name, problem))
+    return ok
+
+def copy(source, changed, removed):
+    for name in changed:
+        destination = os.path.join(DESTINATION, *name.split("/"))
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(os.path.join(source, *name.split("/")), destination)
+    for name in removed:
+        os.remove(os.path.join(DESTINATION, *name.split("/")))
+    # Remove directories that are now empty.
+    for dirpath, dirnames, filenames in os.walk(DESTINATION, topdown=False):
+        if dirpath != DESTINATION and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+
+def update_manifest(changed, removed):
+    """Update the manifest entries for the files that changed, rather
+    than hashing every file again.
+    """
+    if not os.path.exists(corpora.manifest_path):
+        corpora.write_manifest()
+        return
+    with open(corpora.manifest_path) as f:
+        manifest = json.load(f)
+    root = corpora._relative(DESTINATION, corpora.data_path)
+    listing = manifest["directories"][root]
+    for name in removed:
+        listing["files"].pop(name, None)
+    for name in changed:
+        listing["files"][name] = corpora.manifest_entry(
+            os.path.join(DESTINATION, *name.split("/")))
+    categories = []
+    for dirpath, dirnames, filenames in os.walk(DESTINATION):
+        dirnames.sort()
+        for dirname in dirnames:
+            categories.append(corpora._relative(
+                os.path.join(dirpath, dirname), DESTINATION))
+    listing["categories"] = categories
+    with open(corpora.manifest_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        f.write("\n")
+
+def rebuild(changed):
+    """Rebuild the compiled files and derived indexes that were made
+    from corpora that changed.
+    """
+    corpora.manifest = corpora.Manifest.load()
+    corpora.refresh()
+    corpora.cache.clear()
+    paths = set(
+        os.path.normpath(os.path.join(DESTINATION, *name.split("/")))
+        for name in changed
+    )
+    for path in sorted(paths):
+        if os.path.exists(corpora._compiled_path(path)):
+            print("Recompiling %s" % path)
+            corpora._compile(path)
+    for name, (corpus, build, version) in sorted(
+            corpora.index_builders.items()):
+        if corpora.find(corpus) in paths:
+            print("Rebuilding index %s" % name)
+            corpora.index(name)
+
+def clone(directory):
+    subprocess.check_call(
+        ["git", "clone", "--depth", "1", CORPORA_REPO, directory])
+
+def revision(checkout):
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=checkout,
+            stderr=subprocess.DEVNULL
+        ).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "checkout", nargs="?", default=None,
+        help="A local checkout of the corpora project. By default, a "
+        "fresh copy is cloned.")
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="Show what would change, but don't change anything.")
+    parser.add_argument(
+        "--commit", action="store_true",
+        help="Commit the changes to git afterwards.")
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Go ahead even if every bundled file would be removed.")
+    args = parser.parse_args()
+
+    temporary = None
+    checkout = args.checkout
+    if checkout is None:
+        temporary = tempfile.mkdtemp()
+        checkout = os.path.join(temporary, "corpora")
+        clone(checkout)
+    try:
+        source = os.path.join(checkout, "data")
+        if not os.path.isdir(source):
+            print("%s is not a checkout of the corpora project: "
+                  "there's no data directory." % checkout)
+            return 1
+        changed, removed = diff(source)
+        for name in sorted(changed):
+            print("changed %s" % name)
+        for name in sorted(removed):
+            print("removed %s" % name)
+        if not changed and not removed:
+            print("Already up to date.")
+            return 0
+        if removed and not args.force and not (
+                json_files(DESTINATION) - removed):
+            print("Not updating, because every bundled file would be "
+                  "removed. Use --force if that's really what you want.")
+            return 1
+        if not validate(source, changed):
+            print("Not updating, because some files have errors.")
+            return 1
+        if args.dry_run:
+            return 0
+        copy(source, changed, removed)
+        update_manifest(changed, removed)
+        rebuild(changed)
+        rev = revision(checkout)
+    finally:
+        if temporary:
+            shutil.rmtree(temporary)
+
+    if args.commit:
+        subprocess.check_call(
+            ["git", "add", "-A", DESTINATION, corpora.manifest_path])
+        subprocess.check_call([
+            "git", "commit", "-m",
+            "Brought corpora-original up to date with %s revno %s" % (
+                CORPORA_REPO, rev)
+        ])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())